@@ -0,0 +1,126 @@
+#!env python3
+# -*- coding: utf-8 -*-
+"""Atomic publishing of on-disk stores, so readers only ever see a complete version."""
+
+# ------ Imports ------- #
+import os
+import shutil
+import time
+
+from collections.abc import Callable, Iterable
+from typing import BinaryIO, TypeVar
+
+# ------- Types ------- #
+T = TypeVar("T")
+
+# ------- Constants ------- #
+VERSION_SEPARATOR = ".v" # A store at "ranks" lives in "ranks.v<timestamp>", "ranks" is a symlink to it
+
+# ------- Functions ------- #
+def versions(path: str) -> list[str]:
+    """Get the version directories of a store, oldest first.
+
+    Parameters:
+        path -- The path of the store
+    Returns:
+        The paths of the version directories
+    """
+    parent, name = os.path.split(os.path.abspath(path))
+    prefix = name + VERSION_SEPARATOR
+    found = [entry for entry in os.listdir(parent) if entry.startswith(prefix) and entry[len(prefix):].isdigit()]
+    return [os.path.join(parent, entry) for entry in sorted(found, key=lambda entry: int(entry[len(prefix):]))]
+
+def check_store(path: str, arrays: Iterable[str]) -> None:
+    """Check that a path is free or holds a directory store, before it is replaced by a new version.
+
+    A store is a symlink to one of its version directories, or a plain directory of its
+    own .npy arrays written before versioning. Anything else, e.g. a mistyped path to a
+    directory of other files, is left alone.
+
+    Parameters:
+        path -- The path of the store
+        arrays -- The names of the arrays of the store
+    Raises:
+        FileExistsError -- If the path holds something other than the store
+    """
+    path = os.path.abspath(path)
+    if os.path.islink(path):
+        target = os.path.basename(os.readlink(path))
+        prefix = os.path.basename(path) + VERSION_SEPARATOR
+        if not (target.startswith(prefix) and target[len(prefix):].isdigit()):
+            raise FileExistsError(f"{path} is a symlink to {os.readlink(path)}, not to a version of the store.")
+    elif os.path.isdir(path):
+        unexpected = sorted(set(os.listdir(path)) - {f"{name}.npy" for name in arrays})
+        if unexpected:
+            raise FileExistsError(f"{path} holds other files than the store, e.g. {unexpected[0]}.")
+    elif os.path.lexists(path):
+        raise FileExistsError(f"{path} is a file, not a store directory.")
+
+def publish_directory(path: str, write: Callable[[str], None], arrays: Iterable[str]) -> None:
+    """Write a new version of a directory store and publish it in one atomic step.
+
+    The version is written to a directory of its own, and the store path is a symlink
+    that is swapped to it with os.replace, so a reader resolves either the old or the
+    new version, never a missing or mixed one. The previous version is kept for readers
+    that resolved it just before the swap, older ones are removed.
+
+    Parameters:
+        path -- The path of the store
+        write -- Called with the empty version directory to write the files into
+        arrays -- The names of the arrays of the store, see check_store
+    Raises:
+        FileExistsError -- If the path holds something other than the store, nothing is written then
+    """
+    path = os.path.abspath(path)
+    check_store(path, arrays)
+    version_dir = f"{path}{VERSION_SEPARATOR}{time.time_ns()}"
+    os.makedirs(version_dir)
+    try:
+        write(version_dir)
+    except BaseException:
+        shutil.rmtree(version_dir, ignore_errors=True)
+        raise
+
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path) # A store written before versioning, only its own arrays, replaced once
+    link = f"{path}.link"
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.path.basename(version_dir), link)
+    os.replace(link, path)
+
+    for old_dir in versions(path)[:-2]:
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+def read_directory(path: str, read: Callable[[str], T], attempts: int = 3) -> T:
+    """Read all the files of a directory store from a single version.
+
+    A reader that falls more than one version behind the writer can find its version
+    removed, it then reads the version that replaced it.
+
+    Parameters:
+        path -- The path of the store
+        read -- Called with the version directory to read the files from
+        attempts -- The number of versions to try
+    Returns:
+        The result of read
+    """
+    for attempt in range(attempts):
+        version_dir = os.path.realpath(path)
+        try:
+            return read(version_dir)
+        except FileNotFoundError:
+            if attempt == attempts - 1 or os.path.realpath(path) == version_dir:
+                raise
+
+def replace_file(path: str, write: Callable[[BinaryIO], None]) -> None:
+    """Write a single-file store next to the old one and swap it in with os.replace.
+
+    Parameters:
+        path -- The path of the file
+        write -- Called with the open staging file to write the contents to
+    """
+    staging_path = path + ".tmp"
+    with open(staging_path, "wb") as file:
+        write(file)
+    os.replace(staging_path, path)
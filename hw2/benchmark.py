@@ -0,0 +1,210 @@
+#!env python3
+# -*- coding: utf-8 -*-
+"""Scaling benchmark of the PageRank pipeline over generated corpora."""
+
+# ------ Imports ------- #
+import argparse
+import itertools
+import json
+import numpy as np
+import os
+import platform
+import subprocess
+import sys
+
+from datetime import datetime, timezone
+from degree_stats import DegreeCounter
+from groundtruth import compare_edges, load_graph
+from instrumentation import Instrumentation
+from pagerank import build_graph, calculate_pagerank, compare_with_networkx, degree_statistics, get_files_in_local_dir, iter_edges, merge_edges
+from reordering import ORDERINGS
+from solvers import SOLVERS
+from typing import Optional
+
+# ------- Constants ------- #
+GENERATOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "generate-content.py")
+
+# ------- Functions ------- #
+def generate_corpus(directory: str, num_files: int, max_refs: int, model: str = "uniform") -> None:
+    """Generate a corpus and its ground-truth edge list with generate-content.py unless the directory already holds them.
+
+    The generator is seeded, so an existing corpus with the same number of files is reused.
+    The edge list is written next to the corpus, in the directory of the same name ending in -graph.
+
+    Parameters:
+        directory -- The directory of the corpus
+        num_files -- The number of files
+        max_refs -- The maximum number of links per file
+        model -- The graph model of the links, "uniform", "zipf" or "host"
+    """
+    if os.path.isdir(directory) and len(os.listdir(directory)) == num_files and os.path.isdir(f"{directory}-graph"):
+        return
+    print(f"Generating {num_files} files with up to {max_refs} {model} links in {directory}...\n")
+    subprocess.run(
+        [sys.executable, GENERATOR, "--num_files", str(num_files), "--max_refs", str(max_refs), "--directory", directory, "--model", model, "--graph", f"{directory}-graph"],
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+def run_benchmark(
+    directory: str,
+    executor: str = "thread",
+    workers: Optional[int] = None,
+    chunk_size: int = 256,
+    solver: str = "jacobi",
+    statistics_method: str = "exact",
+    damping_factor: float = 0.85,
+    epsilon: float = 1e-8,
+    test_tolerance: Optional[float] = 1e-6,
+    trace_memory: bool = True,
+    solver_only: bool = False,
+    spmv_workers: int = 0,
+    ordering: str = "none",
+) -> dict:
+    """Run the pipeline over a local corpus one timed phase at a time.
+
+    Parameters:
+        directory -- The directory of the corpus
+        executor -- The pool to parse files with, "thread" or "process"
+        workers -- The number of parsing workers, one per CPU if not given
+        chunk_size -- The number of files handed to a worker at a time
+        solver -- The PageRank solver
+        statistics_method -- "exact" or "sketch" link statistics
+        damping_factor -- The damping factor
+        epsilon -- The PageRank convergence tolerance
+        test_tolerance -- The largest absolute difference from NetworkX accepted, no check if not given
+        trace_memory -- Whether to record the peak memory of each phase
+        solver_only -- Whether to load the ground-truth edge list instead of listing and parsing the files
+        spmv_workers -- The number of processes sharing each PageRank iteration, single-threaded if 0
+        ordering -- Relabel the nodes before the PageRank iteration, "none", "degree", "rcm" or "bfs"
+    Returns:
+        The sizes, phase timings and correctness check of the run
+    """
+    instrumentation = Instrumentation(trace_memory=trace_memory)
+    instrumentation.start()
+    truth = load_graph(f"{directory}-graph", mmap=True)
+    try:
+        if solver_only:
+            with instrumentation.phase("load_edge_list") as record:
+                sources, targets = np.asarray(truth.sources), np.asarray(truth.targets)
+                num_files, incoming_links, outgoing_links = len(truth.incoming), truth.incoming, truth.outgoing
+                record["edges"] = len(sources)
+        else:
+            with instrumentation.phase("listing") as record:
+                files = get_files_in_local_dir(directory)
+                record["files"] = num_files = len(files)
+            with instrumentation.phase("parsing") as record:
+                counter = DegreeCounter(num_files)
+                sources, targets = merge_edges(list(counter.count(iter_edges(files, executor, workers, chunk_size))))
+                record["files"], record["edges"] = num_files, len(sources)
+                incoming_links, outgoing_links = counter.incoming, counter.outgoing
+        with instrumentation.phase("graph") as record:
+            adjacency_matrix = build_graph(sources, targets, num_files)
+            record["edges"] = int(adjacency_matrix.nnz)
+        with instrumentation.phase("statistics"):
+            degree_statistics(incoming_links, outgoing_links, statistics_method)
+        with instrumentation.phase("solve") as record:
+            pageranks = calculate_pagerank(adjacency_matrix, damping_factor=damping_factor, epsilon=epsilon, solver=solver, callback=instrumentation.wrap_callback(), spmv_workers=spmv_workers, ordering=ordering)
+            record["edges"] = int(adjacency_matrix.nnz)
+    finally:
+        instrumentation.stop()
+
+    report = instrumentation.report()
+    result = {
+        "files": num_files,
+        "edges": int(adjacency_matrix.nnz),
+        "iterations": len(report["iterations"]),
+        "phases": report["phases"],
+        "total_seconds": report["total_seconds"],
+    }
+    if test_tolerance is not None:
+        # The parsed edges must be exactly the ones the generator drew, and the ranks close to NetworkX
+        missing, extra = compare_edges(sources, targets, truth)
+        max_error, _ = compare_with_networkx(adjacency_matrix, pageranks, damping_factor)
+        result["check"] = {
+            "missing_edges": missing,
+            "unexpected_edges": extra,
+            "max_error": max_error,
+            "tolerance": test_tolerance,
+            "passed": missing == 0 and extra == 0 and max_error <= test_tolerance,
+        }
+    return result
+
+def git_commit() -> Optional[str]:
+    """Get the commit of the working tree, if it is a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(GENERATOR), capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# ------- Main ------- #
+def main():
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description="Benchmark the PageRank pipeline over generated corpora.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="The numbers of files of the corpora.")
+    parser.add_argument("--max-refs", type=int, nargs="+", default=[250], help="The maximum numbers of links per file, i.e. the link densities.")
+    parser.add_argument("--models", nargs="+", choices=["uniform", "zipf", "host"], default=["uniform"], help="The graph models of the corpora, see generate-content.py.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[None], help="The numbers of parsing workers (default: one per CPU).")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread", help="Parse files with a thread or process pool.")
+    parser.add_argument("--chunk-size", type=int, default=256, help="The number of files handed to a parsing worker at a time.")
+    parser.add_argument("--solver", choices=SOLVERS, default="jacobi", help="The PageRank solver.")
+    parser.add_argument("--statistics", choices=["exact", "sketch"], default="exact", help="Exact link statistics or a streaming quantile sketch.")
+    parser.add_argument("--repeat", type=int, default=1, help="The number of runs of every configuration.")
+    parser.add_argument("--data-dir", default="benchmark-data", help="The directory the corpora are generated in.")
+    parser.add_argument("--output", default="benchmark.json", help="The JSON file to write the results to.")
+    parser.add_argument("--test-tolerance", type=float, default=1e-6, help="The largest absolute difference from NetworkX accepted.")
+    parser.add_argument("--no-check", action="store_true", help="Skip the edge list and NetworkX correctness checks.")
+    parser.add_argument("--spmv-workers", type=int, nargs="+", default=[0], help="The numbers of processes sharing each PageRank iteration to compare (default: 0, single-threaded).")
+    parser.add_argument("--ordering", choices=ORDERINGS, default="none", help="Relabel the nodes before the PageRank iteration.")
+    parser.add_argument("--solver-only", action="store_true", help="Load the ground-truth edge list instead of parsing the files, to time the solver without the parse cost.")
+    parser.add_argument("--no-memory", action="store_true", help="Skip memory tracing, which slows down the parsing phase.")
+    args = parser.parse_args()
+
+    runs = []
+    for num_files in args.sizes:
+        for max_refs, model in itertools.product(args.max_refs, args.models):
+            directory = os.path.join(args.data_dir, f"files-{num_files}-refs-{max_refs}-{model}")
+            generate_corpus(directory, num_files, max_refs, model)
+            for workers, spmv_workers in itertools.product(args.workers, args.spmv_workers):
+                for repeat in range(args.repeat):
+                    result = run_benchmark(
+                        directory,
+                        executor=args.executor,
+                        workers=workers,
+                        chunk_size=args.chunk_size,
+                        solver=args.solver,
+                        statistics_method=args.statistics,
+                        test_tolerance=None if args.no_check else args.test_tolerance,
+                        trace_memory=not args.no_memory,
+                        solver_only=args.solver_only,
+                        spmv_workers=spmv_workers,
+                        ordering=args.ordering,
+                    )
+                    config = {"num_files": num_files, "max_refs": max_refs, "model": model, "executor": args.executor, "workers": workers or os.cpu_count(), "spmv_workers": spmv_workers, "repeat": repeat}
+                    runs.append({"config": config, **result})
+                    print(f"\n{num_files} files, {max_refs} max {model} links, {config['workers']} workers, {spmv_workers} SpMV workers: {result['total_seconds']:.2f} seconds\n")
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "cpu_count": os.cpu_count(),
+        "solver": args.solver,
+        "statistics": args.statistics,
+        "ordering": args.ordering,
+        "solver_only": args.solver_only,
+        "runs": runs,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {args.output}.")
+
+    # Fail like a test suite if any run parsed the wrong edges or drifted from NetworkX
+    failed = [run["config"] for run in runs if not run.get("check", {"passed": True})["passed"]]
+    if failed:
+        print(f"ERROR: The edge list or PageRank scores do not match for {len(failed)} runs.")
+        exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!env python3
+# -*- coding: utf-8 -*-
+"""Loaders for the Parquet edge and degree tables written by the hw7 pipeline."""
+
+# ------ Imports ------- #
+import glob
+import numpy as np
+import numpy.typing as npt
+
+try:
+    import pyarrow
+    import pyarrow.parquet as pq
+except ImportError: # Only needed to load the tables of the hw7 pipeline
+    pyarrow = None
+
+# ------- Functions ------- #
+def table_paths(prefix: str, table: str) -> list[str]:
+    """Get the shards of a table written by the hw7 pipeline.
+
+    Parameters:
+        prefix -- The --output prefix of the pipeline
+        table -- The table, "edges" or "degrees"
+    Returns:
+        The paths of the shards, in order
+    """
+    return sorted(glob.glob(f"{glob.escape(prefix)}-{table}-*.parquet"))
+
+def read_table(prefix: str, table: str, columns: list[str]) -> list[npt.NDArray]:
+    """Read the columns of every shard of a table.
+
+    Parameters:
+        prefix -- The --output prefix of the pipeline
+        table -- The table, "edges" or "degrees"
+        columns -- The columns to read
+    Returns:
+        One array per column
+    """
+    if pyarrow is None:
+        raise ImportError("pyarrow is required to read Parquet tables, install it with `pip install pyarrow`.")
+    paths = table_paths(prefix, table)
+    if not paths:
+        raise FileNotFoundError(f"No Parquet shards match {prefix}-{table}-*.parquet.")
+    data = pyarrow.concat_tables([pq.read_table(path, columns=columns) for path in paths])
+    return [data.column(column).to_numpy() for column in columns]
+
+def load_parquet_edges(prefix: str) -> tuple[npt.NDArray[np.int32], npt.NDArray[np.int32]]:
+    """Load the edge list of the hw7 pipeline.
+
+    Parameters:
+        prefix -- The --output prefix of the pipeline
+    Returns:
+        The source and target index of each edge
+    """
+    sources, targets = read_table(prefix, "edges", ["src", "dst"])
+    return sources.astype(np.int32, copy=False), targets.astype(np.int32, copy=False)
+
+def load_parquet_degrees(prefix: str) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """Load the degree table of the hw7 pipeline as dense arrays indexed by page.
+
+    Parameters:
+        prefix -- The --output prefix of the pipeline
+    Returns:
+        The in-degree and out-degree of each node
+    """
+    pages, incoming, outgoing = read_table(prefix, "degrees", ["page", "incoming", "outgoing"])
+    num_nodes = int(pages.max()) + 1 if len(pages) else 0
+    incoming_links = np.zeros(num_nodes, dtype=np.int64)
+    outgoing_links = np.zeros(num_nodes, dtype=np.int64)
+    incoming_links[pages] = incoming
+    outgoing_links[pages] = outgoing
+    return incoming_links, outgoing_links
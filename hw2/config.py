@@ -7,6 +7,7 @@ load_dotenv()
 # Google Cloud Storage
 bucket_name = os.getenv('GCP_BUCKET_NAME')
 bucket_dir = os.getenv('GCP_BUCKET_DIR_NAME')
+storage_emulator_host = os.getenv('STORAGE_EMULATOR_HOST') # e.g. a local fake GCS server
 
 # Data
 local_dir = os.getenv('LOCAL_DIR')
\ No newline at end of file
@@ -0,0 +1,208 @@
+#!env python3
+# -*- coding: utf-8 -*-
+"""Link degree counters and mergeable quantile sketches for the link statistics."""
+
+# ------ Imports ------- #
+import math
+import numpy as np
+import numpy.typing as npt
+
+from collections.abc import Iterable, Iterator
+
+# ------- Constants ------- #
+QUINTILES = [0.2, 0.4, 0.6, 0.8, 1.0]
+
+# ------- Classes ------- #
+class DegreeCounter:
+    """In-degree and out-degree counters accumulated while edges are parsed."""
+
+    def __init__(self, num_nodes: int):
+        self.incoming = np.zeros(num_nodes, dtype=np.int64)
+        self.outgoing = np.zeros(num_nodes, dtype=np.int64)
+
+    def add(self, sources: npt.NDArray[np.int32], targets: npt.NDArray[np.int32]) -> None:
+        """Count a batch of edges, with duplicate links already collapsed.
+
+        Parameters:
+            sources -- The source index of each edge
+            targets -- The target index of each edge
+        """
+        np.add.at(self.outgoing, sources, 1)
+        np.add.at(self.incoming, targets, 1)
+
+    def add_csr(self, indptr: npt.NDArray[np.int32], indices: npt.NDArray[np.int32]) -> None:
+        """Count the edges of a CSR adjacency structure.
+
+        Parameters:
+            indptr -- The row pointers, one row per source
+            indices -- The target of each edge
+        """
+        self.outgoing[:len(indptr) - 1] += np.diff(indptr)
+        self.incoming += np.bincount(indices, minlength=len(self.incoming))
+
+    def count(self, edge_batches: Iterable[tuple[npt.NDArray[np.int32], npt.NDArray[np.int32]]]) -> Iterator[tuple[npt.NDArray[np.int32], npt.NDArray[np.int32]]]:
+        """Count every batch of edges while passing it through.
+
+        Parameters:
+            edge_batches -- The (sources, targets) batches
+        Returns:
+            The same batches
+        """
+        for sources, targets in edge_batches:
+            self.add(sources, targets)
+            yield sources, targets
+
+    def merge(self, other: "DegreeCounter") -> None:
+        """Add the counts of another counter over the same nodes.
+
+        Parameters:
+            other -- The other counter
+        """
+        self.incoming += other.incoming
+        self.outgoing += other.outgoing
+
+class DegreeSketch:
+    """A mergeable quantile sketch of non-negative integer degrees.
+
+    Positive degrees are counted in logarithmic buckets, so every quantile is
+    within the relative accuracy of the true value whatever the number of nodes,
+    in a fixed number of buckets (a DDSketch, Masson et al., 2019). The count,
+    sum, min and max are kept exactly. Sketches built over disjoint sets of nodes
+    can be merged, e.g. one per worker or per block of a streamed degree array.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.buckets = np.zeros(0, dtype=np.int64)
+        self.zeros = 0
+        self.count = 0
+        self.total = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, degrees: npt.ArrayLike) -> None:
+        """Add the degrees of a set of nodes.
+
+        Parameters:
+            degrees -- The degrees
+        """
+        degrees = np.asarray(degrees, dtype=np.int64)
+        if len(degrees) == 0:
+            return
+        positive = degrees[degrees > 0]
+        keys = np.ceil(np.log(positive) / np.log(self.gamma)).astype(np.int64)
+        self._add_buckets(np.bincount(keys) if len(keys) else np.zeros(0, dtype=np.int64))
+        self.zeros += len(degrees) - len(positive)
+        self.count += len(degrees)
+        self.total += int(degrees.sum())
+        self.min = min(self.min, int(degrees.min()))
+        self.max = max(self.max, int(degrees.max()))
+
+    def merge(self, other: "DegreeSketch") -> None:
+        """Merge another sketch with the same relative accuracy into this one.
+
+        Parameters:
+            other -- The other sketch
+        """
+        if other.gamma != self.gamma:
+            raise ValueError("Only sketches with the same relative accuracy can be merged.")
+        self._add_buckets(other.buckets)
+        self.zeros += other.zeros
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def _add_buckets(self, buckets: npt.NDArray[np.int64]) -> None:
+        if len(buckets) > len(self.buckets):
+            self.buckets = np.pad(self.buckets, (0, len(buckets) - len(self.buckets)))
+        self.buckets[:len(buckets)] += buckets
+
+    def mean(self) -> float:
+        """Get the exact mean degree."""
+        return self.total / self.count
+
+    def quantile(self, q: float) -> float:
+        """Get an estimate of a degree quantile.
+
+        Parameters:
+            q -- The quantile, between 0 and 1
+        Returns:
+            The estimated degree, within the relative accuracy of the true quantile
+        """
+        if q >= 1:
+            return float(self.max)
+        if q <= 0:
+            return float(self.min)
+        rank = q * (self.count - 1)
+        if rank < self.zeros:
+            return 0.0
+        key = int(np.searchsorted(np.cumsum(self.buckets), rank - self.zeros, side="right"))
+        estimate = 2 * self.gamma ** key / (self.gamma + 1)
+        return float(min(max(estimate, self.min), self.max))
+
+# ------- Functions ------- #
+def summarize_degrees(incoming_links: npt.ArrayLike, outgoing_links: npt.ArrayLike) -> dict[str, dict[str, float]]:
+    """Summarize the incoming and outgoing link counts of every node.
+
+    Parameters:
+        incoming_links -- The in-degree of each node
+        outgoing_links -- The out-degree of each node
+    Returns:
+        A dictionary of statistics
+    """
+    # Store the statistics in a dictionary for easy access later
+    statistics = {
+        "Incoming Links": {
+            "Average:": np.mean(incoming_links),
+            "Median:": np.median(incoming_links),
+            "Max:": np.max(incoming_links),
+            "Min:": np.min(incoming_links),
+            "Quintiles:": np.quantile(incoming_links, QUINTILES),
+        },
+        "Outgoing Links": {
+            "Average:": np.mean(outgoing_links),
+            "Median:": np.median(outgoing_links),
+            "Max:": np.max(outgoing_links),
+            "Min:": np.min(outgoing_links),
+            "Quintiles:": np.quantile(outgoing_links, QUINTILES),
+        },
+    }
+
+    return statistics
+
+def summarize_sketches(incoming_sketch: DegreeSketch, outgoing_sketch: DegreeSketch) -> dict[str, dict[str, float]]:
+    """Summarize the incoming and outgoing link counts from their sketches.
+
+    Parameters:
+        incoming_sketch -- The sketch of the in-degrees
+        outgoing_sketch -- The sketch of the out-degrees
+    Returns:
+        A dictionary of statistics, with the same structure as summarize_degrees
+    """
+    statistics = {}
+    for name, sketch in (("Incoming Links", incoming_sketch), ("Outgoing Links", outgoing_sketch)):
+        statistics[name] = {
+            "Average:": sketch.mean(),
+            "Median:": sketch.quantile(0.5),
+            "Max:": sketch.max,
+            "Min:": sketch.min,
+            "Quintiles:": np.array([sketch.quantile(q) for q in QUINTILES]),
+        }
+    return statistics
+
+def sketch_degrees(degrees: npt.ArrayLike, relative_accuracy: float = 0.01, chunk_size: int = 1 << 20) -> DegreeSketch:
+    """Sketch a degree array one chunk at a time, e.g. a memory-mapped one.
+
+    Parameters:
+        degrees -- The degree of each node
+        relative_accuracy -- The relative accuracy of the sketch
+        chunk_size -- The number of degrees read at a time
+    Returns:
+        The sketch of the degrees
+    """
+    sketch = DegreeSketch(relative_accuracy)
+    for start in range(0, len(degrees), chunk_size):
+        sketch.add(degrees[start:start + chunk_size])
+    return sketch
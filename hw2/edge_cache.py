@@ -0,0 +1,176 @@
+#!env python3
+# -*- coding: utf-8 -*-
+"""Persistent on-disk cache of parsed edges, keyed per file."""
+
+# ------ Imports ------- #
+import numpy as np
+import numpy.typing as npt
+import os
+
+from atomic import publish_directory, read_directory
+from interning import NameTable
+from scipy import sparse
+from typing import NamedTuple, Optional
+
+# ------- Constants ------- #
+CACHE_ARRAYS = ("names", "stamps", "sizes", "sources", "indptr", "indices", "id_space")
+NUMBERED_IDS = "numbers" # The ID space of pages numbered by their file names
+
+# ------- Classes ------- #
+class EdgeCache(NamedTuple):
+    """The arrays of an edge cache, memory-mapped from disk.
+
+    Each cached file is identified by its name and keyed by a stamp (the GCS
+    generation or the local mtime in nanoseconds) and its size. The edges are
+    stored as the CSR row pointers and column indices of the adjacency matrix,
+    so the outgoing links of a file are `indices[indptr[source]:indptr[source + 1]]`.
+    The ID space records how the sources and targets were numbered, see id_space.
+    """
+    names: npt.NDArray[np.str_]
+    stamps: npt.NDArray[np.int64]
+    sizes: npt.NDArray[np.int64]
+    sources: npt.NDArray[np.int32]
+    indptr: npt.NDArray[np.int32]
+    indices: npt.NDArray[np.int32]
+    id_space: npt.NDArray[np.str_]
+
+# ------- Functions ------- #
+def file_key(file) -> tuple[str, int, int]:
+    """Get the cache key of a blob or local file.
+
+    Parameters:
+        file -- The blob or file path
+    Returns:
+        The name, stamp and size of the file
+    """
+    if isinstance(file, str):
+        stat = os.stat(file)
+        return file, stat.st_mtime_ns, stat.st_size
+    return file.name, int(file.generation or 0), int(file.size or 0)
+
+def id_space(name_table: Optional[NameTable], size: Optional[int] = None) -> str:
+    """Describe how the pages of a run are numbered.
+
+    Pages numbered by their file names share one ID space. Interned pages are only
+    numbered the same way by a table that starts with the same names, so their ID
+    space is the number of names and a fingerprint of them.
+
+    Parameters:
+        name_table -- The table of page names, None if the pages are numbered by their file names
+        size -- The number of names to cover, the whole table if not given
+    Returns:
+        The ID space
+    """
+    if name_table is None:
+        return NUMBERED_IDS
+    size = len(name_table) if size is None else size
+    return f"names:{size}:{name_table.fingerprint(size)}"
+
+def same_id_space(cache: EdgeCache, name_table: Optional[NameTable]) -> bool:
+    """Check whether the IDs of a cache mean the same pages as in the current run.
+
+    The table of the current run may have grown since the cache was written, as IDs
+    are only appended, so only the names the cache was written with are compared.
+
+    Parameters:
+        cache -- The edge cache
+        name_table -- The table of page names, None if the pages are numbered by their file names
+    Returns:
+        Whether the cached edges can be reused
+    """
+    cached = str(cache.id_space)
+    if name_table is None or not cached.startswith("names:"):
+        return cached == id_space(name_table)
+    size = int(cached.split(":")[1])
+    return size <= len(name_table) and cached == id_space(name_table, size)
+
+def load_edge_cache(cache_dir: str) -> Optional[EdgeCache]:
+    """Load an edge cache without copying its arrays into memory.
+
+    Parameters:
+        cache_dir -- The cache directory
+    Returns:
+        The edge cache, or None if there is no complete cache in the directory
+    """
+    if not all(os.path.exists(os.path.join(cache_dir, f"{name}.npy")) for name in CACHE_ARRAYS):
+        return None
+    return read_directory(cache_dir, lambda version_dir: EdgeCache(*(np.load(os.path.join(version_dir, f"{name}.npy"), mmap_mode="r") for name in CACHE_ARRAYS)))
+
+def save_edge_cache(cache_dir: str, names: list[str], stamps: list[int], sizes: list[int], sources: npt.NDArray[np.int32], adjacency_matrix: sparse.csr_matrix, name_table: Optional[NameTable] = None) -> None:
+    """Write an edge cache, replacing the previous one.
+
+    Parameters:
+        cache_dir -- The cache directory
+        names -- The name of each file
+        stamps -- The generation or mtime of each file
+        sizes -- The size of each file
+        sources -- The source index of each file
+        adjacency_matrix -- The adjacency matrix built from the files
+        name_table -- The table the pages were interned with, None if they are numbered by their file names
+    """
+    arrays = EdgeCache(
+        names=np.asarray(names, dtype=np.str_),
+        stamps=np.asarray(stamps, dtype=np.int64),
+        sizes=np.asarray(sizes, dtype=np.int64),
+        sources=np.asarray(sources, dtype=np.int32),
+        indptr=adjacency_matrix.indptr.astype(np.int32),
+        indices=adjacency_matrix.indices.astype(np.int32),
+        id_space=np.asarray(id_space(name_table), dtype=np.str_),
+    )
+
+    def write(version_dir: str) -> None:
+        for name, array in zip(CACHE_ARRAYS, arrays):
+            np.save(os.path.join(version_dir, f"{name}.npy"), array)
+    publish_directory(cache_dir, write, CACHE_ARRAYS)
+
+def match_cache(cache: Optional[EdgeCache], names: list[str], stamps: list[int], sizes: list[int]) -> npt.NDArray[np.int64]:
+    """Find the cache entry of each file whose key is unchanged.
+
+    Parameters:
+        cache -- The edge cache
+        names -- The name of each file
+        stamps -- The generation or mtime of each file
+        sizes -- The size of each file
+    Returns:
+        The index of the matching cache entry for each file, or -1 if the file must be parsed again
+    """
+    matches = np.full(len(names), -1, dtype=np.int64)
+    if cache is None:
+        return matches
+
+    entries = {name: i for i, name in enumerate(cache.names.tolist())}
+    cached = np.array([entries.get(name, -1) for name in names], dtype=np.int64)
+    found = cached >= 0
+    unchanged = found.copy()
+    unchanged[found] = (cache.stamps[cached[found]] == np.asarray(stamps, dtype=np.int64)[found]) & (cache.sizes[cached[found]] == np.asarray(sizes, dtype=np.int64)[found])
+    matches[unchanged] = cached[unchanged]
+    return matches
+
+def cached_edges(cache: EdgeCache, sources: npt.NDArray[np.int32]) -> tuple[npt.NDArray[np.int32], npt.NDArray[np.int32]]:
+    """Get the cached outgoing edges of a set of sources.
+
+    Parameters:
+        cache -- The edge cache
+        sources -- The source indices to keep
+    Returns:
+        The source and target index of each kept edge
+    """
+    num_rows = len(cache.indptr) - 1
+    keep = np.zeros(num_rows, dtype=bool)
+    keep[sources[sources < num_rows]] = True
+
+    rows = np.repeat(np.arange(num_rows, dtype=np.int32), np.diff(cache.indptr))
+    kept = keep[rows]
+    return rows[kept], np.asarray(cache.indices[kept], dtype=np.int32)
+
+def cached_graph(cache: EdgeCache, num_nodes: int) -> sparse.csr_matrix:
+    """Build the adjacency matrix directly on top of the memory-mapped cache arrays.
+
+    Parameters:
+        cache -- The edge cache
+        num_nodes -- The number of nodes in the graph
+    Returns:
+        The adjacency matrix in CSR format
+    """
+    data = np.ones(len(cache.indices), dtype=np.int8)
+    return sparse.csr_matrix((data, cache.indices, cache.indptr), shape=(num_nodes, num_nodes), copy=False)
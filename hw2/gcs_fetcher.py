@@ -0,0 +1,167 @@
+#!env python3
+# -*- coding: utf-8 -*-
+"""Bounded-concurrency bulk downloads of Google Cloud Storage objects."""
+
+# ------ Imports ------- #
+import requests
+
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from typing import Optional, TypeVar
+from urllib.parse import quote
+from urllib3.util.retry import Retry
+
+# ------- Types ------- #
+T = TypeVar("T")
+
+# ------- Constants ------- #
+GCS_ENDPOINT = "https://storage.googleapis.com"
+RETRY_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+
+# ------- Functions ------- #
+def create_session(pool_size: int = 32, retries: int = 5, backoff_factor: float = 0.5) -> requests.Session:
+    """Create an HTTP session with a connection pool shared by all downloads.
+
+    Parameters:
+        pool_size -- The number of connections kept open to the endpoint
+        retries -- The number of times a failed request is retried
+        backoff_factor -- The base of the exponential backoff between retries, in seconds
+    Returns:
+        The session
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=["GET"],
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def object_url(bucket_name: str, object_name: str, endpoint: Optional[str] = None) -> str:
+    """Get the JSON API media URL of an object.
+
+    Parameters:
+        bucket_name -- The name of the bucket
+        object_name -- The name of the object
+        endpoint -- The storage endpoint, e.g. a local fake GCS server
+    Returns:
+        The URL that downloads the whole object
+    """
+    endpoint = (endpoint or GCS_ENDPOINT).rstrip("/")
+    return f"{endpoint}/storage/v1/b/{quote(bucket_name, safe='')}/o/{quote(object_name, safe='')}?alt=media"
+
+def fetch_object(session: requests.Session, bucket_name: str, object_name: str, endpoint: Optional[str] = None) -> bytes:
+    """Download a whole object in a single request.
+
+    Parameters:
+        session -- The shared HTTP session
+        bucket_name -- The name of the bucket
+        object_name -- The name of the object
+        endpoint -- The storage endpoint, e.g. a local fake GCS server
+    Returns:
+        The content of the object
+    """
+    response = session.get(object_url(bucket_name, object_name, endpoint), timeout=60)
+    response.raise_for_status()
+    return response.content
+
+def fetch_range(session: requests.Session, bucket_name: str, object_name: str, start: int, end: int, endpoint: Optional[str] = None) -> bytes:
+    """Download a byte range of an object in a single request.
+
+    Parameters:
+        session -- The shared HTTP session
+        bucket_name -- The name of the bucket
+        object_name -- The name of the object
+        start -- The first byte of the range
+        end -- The end of the range, exclusive
+        endpoint -- The storage endpoint, e.g. a local fake GCS server
+    Returns:
+        The bytes of the range
+    """
+    headers = {"Range": f"bytes={start}-{end - 1}"}
+    response = session.get(object_url(bucket_name, object_name, endpoint), headers=headers, timeout=60)
+    response.raise_for_status()
+    if response.status_code != 206: # The server ignored the range and sent the whole object
+        return response.content[start:end]
+    return response.content
+
+def bounded_map(function: Callable[[T], bytes], items: Iterable[T], concurrency: int = 32) -> Iterator[tuple[T, bytes]]:
+    """Call a download function over items with a bounded number of calls in flight.
+
+    Results are yielded as soon as they arrive, so the caller can parse them while
+    the remaining downloads are still running. At most `concurrency` downloads are
+    in flight and at most `concurrency` finished results are held in memory.
+
+    Parameters:
+        function -- The download function
+        items -- The items to download
+        concurrency -- The maximum number of downloads in flight
+    Returns:
+        An iterator of (item, result) pairs in completion order
+    """
+    items = iter(items)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        in_flight = {}
+
+        def submit_next() -> None:
+            for item in items:
+                in_flight[executor.submit(function, item)] = item
+                return
+
+        # Fill the window, then top it up every time a download finishes
+        for _ in range(concurrency):
+            submit_next()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = in_flight.pop(future)
+                submit_next()
+                yield item, future.result()
+
+def fetch_objects(
+    bucket_name: str,
+    object_names: Iterable[str],
+    concurrency: int = 32,
+    endpoint: Optional[str] = None,
+    session: Optional[requests.Session] = None,
+) -> Iterator[tuple[str, bytes]]:
+    """Download objects with a bounded number of requests in flight.
+
+    Parameters:
+        bucket_name -- The name of the bucket
+        object_names -- The names of the objects
+        concurrency -- The maximum number of downloads in flight
+        endpoint -- The storage endpoint, e.g. a local fake GCS server
+        session -- The shared HTTP session, created if not given
+    Returns:
+        An iterator of (object name, content) pairs in completion order
+    """
+    session = session or create_session(pool_size=concurrency)
+    return bounded_map(lambda object_name: fetch_object(session, bucket_name, object_name, endpoint), object_names, concurrency)
+
+def fetch_ranges(
+    bucket_name: str,
+    ranges: Iterable[tuple[str, int, int]],
+    concurrency: int = 32,
+    endpoint: Optional[str] = None,
+    session: Optional[requests.Session] = None,
+) -> Iterator[tuple[tuple[str, int, int], bytes]]:
+    """Download byte ranges of objects with a bounded number of requests in flight.
+
+    Parameters:
+        bucket_name -- The name of the bucket
+        ranges -- The (object name, start, exclusive end) of each range
+        concurrency -- The maximum number of downloads in flight
+        endpoint -- The storage endpoint, e.g. a local fake GCS server
+        session -- The shared HTTP session, created if not given
+    Returns:
+        An iterator of (range, content) pairs in completion order
+    """
+    session = session or create_session(pool_size=concurrency)
+    return bounded_map(lambda item: fetch_range(session, bucket_name, *item, endpoint=endpoint), ranges, concurrency)
@@ -1,12 +1,18 @@
 #!env python3
 import argparse
-import random
+import numpy as np
 import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from groundtruth import dedupe_edges, write_graph
+from shards import shard_name, write_shard
 
-random.seed(0) # set the seed to zero so it's deterministic
+HEADER = "<!DOCTYPE html>\n\
+<html>\n\
+<body>\n"
 
-def add_text(f):
-    text = "Lorem ipsum dolor sit amet, \
+TEXT = "Lorem ipsum dolor sit amet, \
 consectetur adipiscing elit, sed do \
 eiusmod tempor incididunt ut labore \
 et dolore magna aliqua. Ut enim ad\n\
@@ -18,43 +24,99 @@ cillum dolore eu fugiat nulla pariatur. \
 Excepteur sint occaecat cupidatat non \
 proident, sunt in culpa qui officia \
 deserunt mollit anim id est laborum.\n<p>\n"
-    f.write(text)
 
+FOOTER = "</body>\n\
+</html>\n"
 
-def add_headers(f):
-    text = "<!DOCTYPE html>\n\
-<html>\n\
-<body>\n"
-    f.write(text)
+# files handed to a worker at a time
+CHUNK_SIZE = 1000
 
+# how link targets are picked:
+#   uniform -- every page is equally likely
+#   zipf -- the k-th most popular page is picked with probability ~ 1 / k^s, giving the
+#           heavy-tailed in-degree of preferential attachment; the popular pages are
+#           spread over the ids by a fixed permutation
+#   host -- pages are grouped into hosts of consecutive ids and most links stay within
+#           the host of the page, the others are uniform
+MODELS = ("uniform", "zipf", "host")
+GraphModel = namedtuple("GraphModel", ["name", "zipf_exponent", "host_size", "locality"])
+UNIFORM = GraphModel("uniform", 1.0, 100, 0.8)
 
-def add_footers(f):
-    text = "</body>\n\
-</html>\n"
-    f.write(text)
+
+def file_rng(seed, idx):
+    # every file has its own stream, so its content does not depend on
+    # which worker generates it or in which order
+    return np.random.default_rng([seed, idx])
+
+
+@lru_cache(maxsize=1)
+def zipf_table(num_files, exponent, seed):
+    # computed once per worker, every worker gets the same table from the seed; the
+    # permutation has a three-word seed, apart from the (seed, page) streams of the pages
+    weights = 1.0 / np.arange(1, num_files + 1) ** exponent
+    cdf = np.cumsum(weights)
+    pages = np.random.default_rng([seed, num_files, 0]).permutation(num_files)
+    return cdf / cdf[-1], pages
+
+
+def pick_links(rng, idx, num_refs, num_files, seed, model):
+    if model.name == "zipf":
+        cdf, pages = zipf_table(num_files, model.zipf_exponent, seed)
+        ranks = np.minimum(np.searchsorted(cdf, rng.random(num_refs), side="right"), num_files - 1)
+        return pages[ranks]
+    if model.name == "host":
+        host_start = idx - idx % model.host_size
+        host_stop = min(host_start + model.host_size, num_files)
+        local = rng.random(num_refs) < model.locality
+        return np.where(local, rng.integers(host_start, host_stop, size=num_refs),
+                        rng.integers(0, num_files, size=num_refs))
+    return rng.integers(0, num_files, size=num_refs)
+
+
+def link_html(lnk):
+    return TEXT + "<a HREF=\"" + str(lnk) + ".html\"> This is a link </a>\n<p>\n"
+
+
+def generate_links(idx, max_refs, num_files, seed, model=UNIFORM):
+    rng = file_rng(seed, idx)
+    # how many references in this file
+    num_refs = int(rng.integers(0, max_refs))
+    return pick_links(rng, idx, num_refs, num_files, seed, model)
 
 
-def add_link(f, lnk):
-    text = "<a HREF=\""
-    f.write(text)
-    text = str(lnk) + ".html\""
-    f.write(text)
-    text = "> This is a link </a>\n<p>\n"
-    f.write(text)
+def generate_content(links):
+    return HEADER + "".join(link_html(lnk) for lnk in links.tolist()) + FOOTER
 
 
-def generate_file(idx, max_refs, num_files, directory):
+def chunk_edges(start, stop, links):
+    # the edges of a chunk of pages, deduplicated like the pipelines do
+    sources = np.repeat(np.arange(start, stop), [len(lnk) for lnk in links])
+    targets = np.concatenate(links) if links else np.empty(0, dtype=np.int64)
+    return dedupe_edges(sources, targets)
+
+
+def generate_file(idx, links, directory):
     fname = os.path.join(directory, str(idx) + ".html")
+    content = generate_content(links)
+    # build the page in memory and write it in one call
     with open(fname, 'w', encoding="utf-8") as f:
-        # how many references in this file
-        add_headers(f)
-        num_refs = random.randrange(0, max_refs)
-        for i in range(0, num_refs):
-            add_text(f)
-            lnk = random.randrange(0, num_files)
-            add_link(f, lnk)
-        add_footers(f)
-        f.close()
+        f.write(content)
+
+
+def generate_files(start, stop, max_refs, num_files, directory, seed=0, model=UNIFORM, graph=False):
+    links = [generate_links(idx, max_refs, num_files, seed, model) for idx in range(start, stop)]
+    for idx, lnk in zip(range(start, stop), links):
+        generate_file(idx, lnk, directory)
+    # the edges are only sent back to be written with --graph
+    return chunk_edges(start, stop, links) if graph else None
+
+
+def generate_shard(shard, start, stop, max_refs, num_files, directory, seed=0, model=UNIFORM, graph=False):
+    links = [generate_links(idx, max_refs, num_files, seed, model) for idx in range(start, stop)]
+    # the pages are packed back to back, each one byte for byte the same as its file
+    pages = [(idx, generate_content(lnk).encode("utf-8")) for idx, lnk in zip(range(start, stop), links)]
+    write_shard(os.path.join(directory, shard_name(shard)), pages)
+    return chunk_edges(start, stop, links) if graph else None
 
 
 def main():
@@ -65,15 +127,54 @@ def main():
                         help="Specify the maximum number of references per file", default=250)
     parser.add_argument(
         '-d', '--directory', help="Specify the directory to generate the files to", type=str, default="data")
+    parser.add_argument(
+        '-s', '--seed', help="Specify the seed of the generated content", type=int, default=0)
+    parser.add_argument(
+        '-w', '--workers', help="Specify the number of worker processes (default: one per CPU)", type=int, default=None)
+    parser.add_argument(
+        '--shards', help="Pack the pages into shard files with an offset index instead of one file per page", action="store_true")
+    parser.add_argument(
+        '--pages_per_shard', help="Specify the number of pages packed into each shard", type=int, default=10000)
+    parser.add_argument(
+        '--model', help="Specify how link targets are picked", choices=MODELS, default="uniform")
+    parser.add_argument(
+        '--zipf_exponent', help="Specify the exponent of the zipf model", type=float, default=1.0)
+    parser.add_argument(
+        '--host_size', help="Specify the number of pages per host of the host model", type=int, default=100)
+    parser.add_argument(
+        '--locality', help="Specify the fraction of links within the host of the host model", type=float, default=0.8)
+    parser.add_argument(
+        '-g', '--graph', help="Also write the edge list and degree arrays of the pages to this directory", type=str, default=None)
     args = parser.parse_args()
+    model = GraphModel(args.model, args.zipf_exponent, args.host_size, args.locality)
 
     if not os.path.exists(args.directory):
         os.makedirs(args.directory)
 
     print("Number of files:", args.num_files)
     print("Maximum number of references per file:", args.max_refs)
-    for i in range(0, args.num_files):
-        generate_file(i, args.max_refs, args.num_files, args.directory)
+    print("Graph model:", args.model)
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        if args.shards:
+            futures = [
+                executor.submit(generate_shard, shard, start, min(start + args.pages_per_shard, args.num_files),
+                                args.max_refs, args.num_files, args.directory, args.seed, model, args.graph is not None)
+                for shard, start in enumerate(range(0, args.num_files, args.pages_per_shard))
+            ]
+        else:
+            futures = [
+                executor.submit(generate_files, start, min(start + CHUNK_SIZE, args.num_files),
+                                args.max_refs, args.num_files, args.directory, args.seed, model, args.graph is not None)
+                for start in range(0, args.num_files, CHUNK_SIZE)
+            ]
+        # the chunks come back in page order, so their edges stay sorted
+        edges = [future.result() for future in futures]
+
+    if args.graph:
+        sources = np.concatenate([sources for sources, _ in edges]) if edges else np.empty(0, dtype=np.int32)
+        targets = np.concatenate([targets for _, targets in edges]) if edges else np.empty(0, dtype=np.int32)
+        write_graph(args.graph, sources, targets, args.num_files)
+        print("Number of edges:", len(sources))
 
 
 if __name__ == "__main__":
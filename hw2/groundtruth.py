@@ -0,0 +1,86 @@
+#!env python3
+# -*- coding: utf-8 -*-
+"""Ground-truth edge list and degree arrays written by generate-content.py --graph."""
+
+# ------ Imports ------- #
+import numpy as np
+import numpy.typing as npt
+import os
+
+from typing import NamedTuple
+
+# ------- Constants ------- #
+ARRAYS = ("sources", "targets", "incoming", "outgoing")
+
+# ------- Classes ------- #
+class GroundTruth(NamedTuple):
+    """The graph of a generated corpus, as the generator drew it.
+
+    The edges are deduplicated and sorted by source and target, the same edges the
+    pipelines collapse the links of the pages into.
+    """
+    sources: npt.NDArray[np.int32]
+    targets: npt.NDArray[np.int32]
+    incoming: npt.NDArray[np.int64]
+    outgoing: npt.NDArray[np.int64]
+
+# ------- Functions ------- #
+def dedupe_edges(sources: npt.NDArray[np.int32], targets: npt.NDArray[np.int32]) -> tuple[npt.NDArray[np.int32], npt.NDArray[np.int32]]:
+    """Collapse duplicate links in an edge list.
+
+    Parameters:
+        sources -- The source index of each edge
+        targets -- The target index of each edge
+    Returns:
+        The unique edges, sorted by source and target
+    """
+    keys = np.unique((np.asarray(sources, dtype=np.int64) << 32) | np.asarray(targets, dtype=np.int64))
+    return (keys >> 32).astype(np.int32), (keys & 0xFFFFFFFF).astype(np.int32)
+
+def write_graph(directory: str, sources: npt.NDArray[np.int32], targets: npt.NDArray[np.int32], num_nodes: int) -> None:
+    """Write the edge list and degree arrays of a corpus as .npy files.
+
+    Parameters:
+        directory -- The directory to write the arrays to
+        sources -- The source index of each unique edge, sorted
+        targets -- The target index of each unique edge
+        num_nodes -- The number of pages of the corpus
+    """
+    os.makedirs(directory, exist_ok=True)
+    arrays = {
+        "sources": sources.astype(np.int32, copy=False),
+        "targets": targets.astype(np.int32, copy=False),
+        "incoming": np.bincount(targets, minlength=num_nodes).astype(np.int64),
+        "outgoing": np.bincount(sources, minlength=num_nodes).astype(np.int64),
+    }
+    for name in ARRAYS:
+        np.save(os.path.join(directory, name + ".npy"), arrays[name])
+
+def load_graph(directory: str, mmap: bool = False) -> GroundTruth:
+    """Load the edge list and degree arrays written by generate-content.py --graph.
+
+    Parameters:
+        directory -- The directory of the arrays
+        mmap -- Whether to memory-map the arrays instead of reading them
+    Returns:
+        The ground-truth graph
+    """
+    paths = [os.path.join(directory, name + ".npy") for name in ARRAYS]
+    missing = [path for path in paths if not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(f"No ground-truth graph in {directory}, missing {', '.join(missing)}.")
+    return GroundTruth(*(np.load(path, mmap_mode="r" if mmap else None) for path in paths))
+
+def compare_edges(sources: npt.NDArray[np.int32], targets: npt.NDArray[np.int32], truth: GroundTruth) -> tuple[int, int]:
+    """Compare a parsed edge list with the ground truth exactly.
+
+    Parameters:
+        sources -- The source index of each parsed edge
+        targets -- The target index of each parsed edge
+        truth -- The ground-truth graph
+    Returns:
+        The number of ground-truth edges that were not parsed, and of parsed edges that are not in the ground truth
+    """
+    parsed = np.unique((np.asarray(sources, dtype=np.int64) << 32) | np.asarray(targets, dtype=np.int64))
+    expected = (np.asarray(truth.sources, dtype=np.int64) << 32) | np.asarray(truth.targets, dtype=np.int64)
+    return len(np.setdiff1d(expected, parsed, assume_unique=True)), len(np.setdiff1d(parsed, expected, assume_unique=True))
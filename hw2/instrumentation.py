@@ -0,0 +1,115 @@
+#!env python3
+# -*- coding: utf-8 -*-
+"""Opt-in per-phase timing, memory and solver instrumentation for the PageRank pipeline."""
+
+# ------ Imports ------- #
+import json
+import time
+import tracemalloc
+
+from contextlib import contextmanager
+from solvers import IterationCallback
+from typing import Iterator, Optional
+
+# ------- Classes ------- #
+class Instrumentation:
+    """Collects the wall time, CPU time and peak memory of each phase of a run.
+
+    A disabled instance records nothing, so the pipeline can be instrumented
+    unconditionally and only pays for it when a report is asked for. Memory is
+    traced with tracemalloc, which does not see allocations in worker processes.
+    """
+
+    def __init__(self, enabled: bool = True, trace_memory: bool = True):
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self.phases = {}
+        self.iterations = []
+
+    def start(self) -> None:
+        """Start tracing memory allocations."""
+        if self.trace_memory:
+            tracemalloc.start()
+
+    def stop(self) -> None:
+        """Stop tracing memory allocations."""
+        if self.trace_memory:
+            tracemalloc.stop()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[dict]:
+        """Time a phase of the run.
+
+        The phase record is yielded so the caller can add the number of `files` and
+        `edges` it processed, from which the throughput of the phase is derived.
+
+        Parameters:
+            name -- The name of the phase
+        Returns:
+            The record of the phase
+        """
+        record = {}
+        if not self.enabled:
+            yield record
+            return
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        yield record
+        wall_seconds = time.perf_counter() - wall_start
+        record["wall_seconds"] = wall_seconds
+        record["cpu_seconds"] = time.process_time() - cpu_start
+        if self.trace_memory:
+            # Peak above what was already allocated when the phase started
+            record["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1] - baseline
+        for count in ("files", "edges"):
+            if count in record and wall_seconds > 0:
+                record[f"{count}_per_second"] = record[count] / wall_seconds
+        self.phases[name] = record
+
+    def record_iteration(self, iteration: int, residual: float, elapsed: float) -> None:
+        """Record a solver iteration, with the same signature as a solver callback.
+
+        Parameters:
+            iteration -- The iteration number
+            residual -- The change since the previous iteration
+            elapsed -- The wall time since the solver started, in seconds
+        """
+        if not self.enabled:
+            return
+        previous = self.iterations[-1]["elapsed_seconds"] if self.iterations and iteration > 1 else 0.0
+        self.iterations.append({"iteration": iteration, "residual": residual, "elapsed_seconds": elapsed, "seconds": elapsed - previous})
+
+    def wrap_callback(self, callback: Optional[IterationCallback] = None) -> Optional[IterationCallback]:
+        """Get a solver callback that records every iteration before calling another callback.
+
+        Parameters:
+            callback -- The callback to forward every iteration to, if any
+        Returns:
+            The callback to pass to the solver
+        """
+        if not self.enabled:
+            return callback
+        def record_and_forward(iteration: int, residual: float, elapsed: float) -> None:
+            self.record_iteration(iteration, residual, elapsed)
+            if callback is not None:
+                callback(iteration, residual, elapsed)
+        return record_and_forward
+
+    def report(self) -> dict:
+        """Get the report of the phases and solver iterations recorded so far."""
+        return {
+            "phases": self.phases,
+            "total_seconds": sum(phase["wall_seconds"] for phase in self.phases.values()),
+            "iterations": self.iterations,
+        }
+
+    def write_report(self, path: str) -> None:
+        """Write the report as JSON.
+
+        Parameters:
+            path -- The path of the report
+        """
+        with open(path, "w") as file:
+            json.dump(self.report(), file, indent=2)
@@ -0,0 +1,153 @@
+#!env python3
+# -*- coding: utf-8 -*-
+"""Interning table of page names and URLs to dense integer IDs."""
+
+# ------ Imports ------- #
+import hashlib
+import numpy as np
+import numpy.typing as npt
+import os
+
+from atomic import replace_file
+from typing import Iterable, Optional
+from urllib.parse import unquote, urljoin, urlsplit, urlunsplit
+
+# ------- Functions ------- #
+def is_url(name: str) -> bool:
+    """Check whether a page name is an absolute URL."""
+    parts = urlsplit(name)
+    return bool(parts.scheme and parts.netloc)
+
+def page_name(link: str, base: Optional[str] = None) -> str:
+    """Normalize a link or file name into the name of its page.
+
+    Absolute URLs keep their scheme, host, path and query, with the scheme and host
+    lowercased and the fragment dropped, and relative links are resolved against the
+    URL of the page they are on. Any other name is reduced to its base name without
+    extension, so "data/123.html" and "123.html" are both the page "123".
+
+    Parameters:
+        link -- The href of a link, or the name of a page
+        base -- The name of the page the link is on
+    Returns:
+        The page name
+    """
+    if base is not None and is_url(base):
+        link = urljoin(base, link)
+    if is_url(link):
+        parts = urlsplit(link)
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", parts.query, ""))
+    return os.path.splitext(os.path.basename(urlsplit(link).path))[0]
+
+def file_page_name(file_name: str) -> str:
+    """Get the page name of a stored page.
+
+    Crawled pages are stored under their percent-encoded URL, e.g.
+    "https%3A%2F%2Fexample.com%2Findex.html", generated pages under their number.
+
+    Parameters:
+        file_name -- The path of the file or the name of the blob
+    Returns:
+        The page name
+    """
+    return page_name(unquote(os.path.basename(file_name)))
+
+# ------- Classes ------- #
+class NameTable:
+    """A hash table interning page names to dense int32 IDs in first-seen order.
+
+    IDs are never reassigned, so the IDs of a reloaded table stay valid for the
+    edge cache, rank store and incremental ranks of earlier runs, and new pages
+    are appended after the known ones.
+    """
+
+    def __init__(self, names: Iterable[str] = ()):
+        self.names: list[str] = []
+        self.ids: dict[str, int] = {}
+        for name in names:
+            self.intern(name)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.ids
+
+    def intern(self, name: str) -> int:
+        """Get the ID of a name, assigning the next free ID to a new one.
+
+        Parameters:
+            name -- The page name
+        Returns:
+            The ID of the page
+        """
+        page = self.ids.get(name)
+        if page is None:
+            if len(self.names) > np.iinfo(np.int32).max:
+                raise OverflowError("The name table is full, IDs must fit in int32.")
+            page = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return page
+
+    def intern_many(self, names: Iterable[str]) -> npt.NDArray[np.int32]:
+        """Intern a batch of names.
+
+        Parameters:
+            names -- The page names
+        Returns:
+            The ID of each page
+        """
+        return np.fromiter((self.intern(name) for name in names), dtype=np.int32)
+
+    def lookup(self, name: str) -> int:
+        """Get the ID of a name without interning it.
+
+        Parameters:
+            name -- The page name
+        Returns:
+            The ID of the page, or -1 if it is unknown
+        """
+        return self.ids.get(name, -1)
+
+    def name(self, page: int) -> str:
+        """Get the name of an ID."""
+        return self.names[page]
+
+    def fingerprint(self, size: Optional[int] = None) -> str:
+        """Hash the names of the first IDs, to tell whether IDs saved elsewhere still mean the same pages.
+
+        Parameters:
+            size -- The number of IDs to cover, all of them if not given
+        Returns:
+            The hex digest of the names
+        """
+        names = self.names if size is None else self.names[:size]
+        return hashlib.sha256("\0".join(names).encode("utf-8")).hexdigest()
+
+    def save(self, path: str) -> None:
+        """Write the table as UTF-8 names and their offsets, replacing the previous one.
+
+        Parameters:
+            path -- The path of the table, an .npz file
+        """
+        encoded = [name.encode("utf-8") for name in self.names]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(name) for name in encoded])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+        replace_file(path, lambda file: np.savez(file, offsets=offsets, data=data))
+
+    @classmethod
+    def load(cls, path: str) -> "NameTable":
+        """Load a table written by save, or start an empty one if there is none.
+
+        Parameters:
+            path -- The path of the table
+        Returns:
+            The name table
+        """
+        if not os.path.exists(path):
+            return cls()
+        with np.load(path) as arrays:
+            offsets, data = arrays["offsets"], arrays["data"].tobytes()
+        return cls(data[start:end].decode("utf-8") for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist()))
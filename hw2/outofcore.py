@@ -0,0 +1,197 @@
+#!env python3
+# -*- coding: utf-8 -*-
+"""External-memory PageRank over edge blocks partitioned by destination range."""
+
+# ------ Imports ------- #
+import numpy as np
+import numpy.typing as npt
+import os
+
+from collections.abc import Iterable, Iterator
+from numpy.lib.format import open_memmap
+from typing import NamedTuple
+
+# ------- Constants ------- #
+EDGE_BYTES = 2 * np.dtype(np.int32).itemsize
+# Bytes touched per edge while streaming a block: the edge itself, the gathered source rank and the weights
+BYTES_PER_STREAMED_EDGE = EDGE_BYTES + 3 * np.dtype(np.float64).itemsize
+# Bytes held per node of the destination range: the accumulator and the slices of both rank vectors
+BYTES_PER_BLOCK_NODE = 4 * np.dtype(np.float64).itemsize
+
+# ------- Classes ------- #
+class BlockPlan(NamedTuple):
+    """How the graph is split to keep the peak memory under a limit."""
+    num_nodes: int
+    nodes_per_block: int
+    edges_per_chunk: int
+
+    @property
+    def num_blocks(self) -> int:
+        """Get the number of destination blocks."""
+        return max(1, -(-self.num_nodes // self.nodes_per_block))
+
+    def block_range(self, block: int) -> tuple[int, int]:
+        """Get the destination range [lo, hi) of a block."""
+        lo = block * self.nodes_per_block
+        return lo, min(lo + self.nodes_per_block, self.num_nodes)
+
+# ------- Functions ------- #
+def plan_blocks(num_nodes: int, memory_limit: int) -> BlockPlan:
+    """Size the destination blocks and edge chunks for a memory limit.
+
+    Half of the budget goes to the per-node arrays of the block being accumulated,
+    the other half to the chunk of edges being streamed.
+
+    Parameters:
+        num_nodes -- The number of nodes in the graph
+        memory_limit -- The memory budget of an iteration, in bytes
+    Returns:
+        The block plan
+    """
+    nodes_per_block = max(1, min(num_nodes, memory_limit // 2 // BYTES_PER_BLOCK_NODE))
+    edges_per_chunk = max(1, memory_limit // 2 // BYTES_PER_STREAMED_EDGE)
+    return BlockPlan(num_nodes, nodes_per_block, edges_per_chunk)
+
+def block_path(block_dir: str, block: int) -> str:
+    """Get the path of the edge file of a block."""
+    return os.path.join(block_dir, f"block-{block:05d}.edges")
+
+def partition_edges(edge_batches: Iterable[tuple[npt.NDArray[np.int32], npt.NDArray[np.int32]]], plan: BlockPlan, block_dir: str) -> None:
+    """Append batches of edges to on-disk blocks by destination range.
+
+    Each block file holds (source, target) int32 pairs. The out-degree and in-degree
+    of every node are written to memory-mapped arrays in the same directory.
+
+    Parameters:
+        edge_batches -- The (sources, targets) batches, with duplicate links collapsed
+        plan -- The block plan
+        block_dir -- The directory of the blocks
+    """
+    os.makedirs(block_dir, exist_ok=True)
+    outgoing_links = open_memmap(os.path.join(block_dir, "out_degrees.npy"), mode="w+", dtype=np.int32, shape=(plan.num_nodes,))
+    outgoing_links[:] = 0
+
+    block_files = [open(block_path(block_dir, block), "wb") for block in range(plan.num_blocks)]
+    try:
+        for sources, targets in edge_batches:
+            # Batches come from whole files, so a node's out-degree only needs its unique sources added up
+            unique_sources, counts = np.unique(sources, return_counts=True)
+            outgoing_links[unique_sources] += counts.astype(np.int32)
+
+            blocks = targets // plan.nodes_per_block
+            order = np.argsort(blocks, kind="stable")
+            bounds = np.searchsorted(blocks[order], np.arange(plan.num_blocks + 1))
+            for block in np.flatnonzero(np.diff(bounds)):
+                selected = order[bounds[block]:bounds[block + 1]]
+                block_files[block].write(np.column_stack((sources[selected], targets[selected])).astype(np.int32).tobytes())
+    finally:
+        for block_file in block_files:
+            block_file.close()
+    outgoing_links.flush()
+
+    # The in-degrees of a block only depend on its own edges
+    incoming_links = open_memmap(os.path.join(block_dir, "in_degrees.npy"), mode="w+", dtype=np.int32, shape=(plan.num_nodes,))
+    for block in range(plan.num_blocks):
+        lo, hi = plan.block_range(block)
+        counts = np.zeros(hi - lo, dtype=np.int64)
+        for _, targets in stream_block(block_dir, block, plan.edges_per_chunk):
+            counts += np.bincount(targets - lo, minlength=hi - lo)
+        incoming_links[lo:hi] = counts
+    incoming_links.flush()
+
+def stream_block(block_dir: str, block: int, edges_per_chunk: int) -> Iterator[tuple[npt.NDArray[np.int32], npt.NDArray[np.int32]]]:
+    """Read the edges of a block sequentially in chunks.
+
+    Parameters:
+        block_dir -- The directory of the blocks
+        block -- The block number
+        edges_per_chunk -- The number of edges read at a time
+    Returns:
+        An iterator of (sources, targets) chunks
+    """
+    with open(block_path(block_dir, block), "rb") as block_file:
+        while True:
+            chunk = np.fromfile(block_file, dtype=np.int32, count=2 * edges_per_chunk)
+            if len(chunk) == 0:
+                return
+            chunk = chunk.reshape(-1, 2)
+            yield chunk[:, 0], chunk[:, 1]
+
+def load_degrees(block_dir: str) -> tuple[npt.NDArray[np.int32], npt.NDArray[np.int32]]:
+    """Load the memory-mapped in-degrees and out-degrees of a partitioned graph.
+
+    Parameters:
+        block_dir -- The directory of the blocks
+    Returns:
+        The in-degree and out-degree of each node
+    """
+    return (
+        np.load(os.path.join(block_dir, "in_degrees.npy"), mmap_mode="r"),
+        np.load(os.path.join(block_dir, "out_degrees.npy"), mmap_mode="r"),
+    )
+
+def calculate_pagerank_out_of_core(
+    block_dir: str,
+    plan: BlockPlan,
+    damping_factor: float = 0.85,
+    epsilon: float = 1e-8,
+    max_iterations: int = 200,
+) -> npt.NDArray[np.float64]:
+    """
+    Calculate the PageRank of a partitioned graph without loading it into memory.
+
+    The rank vectors are memory-mapped and every iteration streams the blocks once,
+    accumulating the incoming rank of one destination range at a time.
+
+    Parameters:
+        block_dir -- The directory of the blocks
+        plan -- The block plan the graph was partitioned with
+        damping_factor -- The damping factor
+        epsilon -- The convergence tolerance on the L1 change between iterations
+        max_iterations -- The maximum number of iterations
+
+    Returns:
+        The memory-mapped PageRank values
+    """
+    print("\nCalculating PageRank out of core...\n")
+    num_nodes = plan.num_nodes
+    _, outgoing_links = load_degrees(block_dir)
+    final_pagerank = current_pagerank = open_memmap(os.path.join(block_dir, "pagerank.npy"), mode="w+", dtype=np.float64, shape=(num_nodes,))
+    next_pagerank = open_memmap(os.path.join(block_dir, "pagerank.next.npy"), mode="w+", dtype=np.float64, shape=(num_nodes,))
+    scaled_pagerank = open_memmap(os.path.join(block_dir, "pagerank.scaled.npy"), mode="w+", dtype=np.float64, shape=(num_nodes,))
+    current_pagerank[:] = 1.0 / num_nodes
+
+    for _ in range(max_iterations):
+        # Divide every rank by its out-degree and collect the rank of dangling nodes, one range at a time
+        dangling_rank = 0.0
+        for block in range(plan.num_blocks):
+            lo, hi = plan.block_range(block)
+            degrees = outgoing_links[lo:hi]
+            ranks = current_pagerank[lo:hi]
+            dangling_rank += ranks[degrees == 0].sum()
+            scaled_pagerank[lo:hi] = np.divide(ranks, degrees, out=np.zeros(hi - lo), where=degrees > 0)
+
+        # Stream the edges of each destination range and accumulate its incoming rank
+        error = 0.0
+        base_rank = (damping_factor * dangling_rank + 1 - damping_factor) / num_nodes
+        for block in range(plan.num_blocks):
+            lo, hi = plan.block_range(block)
+            incoming_rank = np.zeros(hi - lo)
+            for sources, targets in stream_block(block_dir, block, plan.edges_per_chunk):
+                incoming_rank += np.bincount(targets - lo, weights=scaled_pagerank[sources], minlength=hi - lo)
+            next_pagerank[lo:hi] = damping_factor * incoming_rank + base_rank
+            error += np.abs(next_pagerank[lo:hi] - current_pagerank[lo:hi]).sum()
+
+        current_pagerank, next_pagerank = next_pagerank, current_pagerank
+        if error < epsilon:
+            break
+    else:
+        print(f"WARNING: PageRank did not converge after {max_iterations} iterations.")
+
+    # Leave the result in pagerank.npy whichever buffer the last iteration wrote to
+    if current_pagerank is not final_pagerank:
+        for block in range(plan.num_blocks):
+            lo, hi = plan.block_range(block)
+            final_pagerank[lo:hi] = current_pagerank[lo:hi]
+    final_pagerank.flush()
+    return final_pagerank
@@ -5,6 +5,9 @@
 
 # ------ Imports ------- #
 import argparse
+import cProfile
+import io
+import mmap
 import numpy as np
 import numpy.typing as npt
 import networkx as nx
@@ -12,11 +15,32 @@ import os
 import re
 import time
 
-from concurrent.futures import ThreadPoolExecutor
-from config import bucket_name, bucket_dir, local_dir
+from atomic import check_store, replace_file
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from columnar import load_parquet_degrees, load_parquet_edges
+from config import bucket_name, bucket_dir, local_dir, storage_emulator_host
+from degree_stats import DegreeCounter, sketch_degrees, summarize_degrees, summarize_sketches
+from edge_cache import CACHE_ARRAYS, cached_edges, cached_graph, file_key, load_edge_cache, match_cache, same_id_space, save_edge_cache
+from gcs_fetcher import fetch_objects, fetch_ranges
+from groundtruth import compare_edges, dedupe_edges, load_graph
 from google.cloud import storage
+from instrumentation import Instrumentation
+from interning import NameTable, file_page_name, page_name
+from outofcore import calculate_pagerank_out_of_core, load_degrees, partition_edges, plan_blocks
+from rankstore import STORE_ARRAYS, top_k, write_rank_store
+from reordering import ORDERINGS, node_order, permute_graph, permute_vector, restore_vector
+from scipy import sparse
+from shared_spmv import SharedMatVec
+from shards import Shard, count_pages, get_local_shards, index_name, is_shard, page_ranges
+from solvers import EXTRAPOLATION_PERIOD, SOLVERS, IterationCallback, gauss_seidel_step, jacobi_step, solve
 from tqdm import tqdm
-from typing import Union
+from typing import Iterator, Optional, Union
+from urllib.parse import urlsplit
+
+# ------- Constants ------- #
+LINK_PATTERN = re.compile(rb'<a\s+HREF="(?:[^"]*/)?(\d+)(?:\.[^"/]*)?">') # Matches the numeric part of <a HREF="path/123.html">
+NAMED_LINK_PATTERN = re.compile(rb'<a\s[^>]*?href\s*=\s*"([^"]*)"', re.IGNORECASE) # Matches the href of any <a ... href="link">
+WEB_SCHEMES = ("", "http", "https") # Links to other schemes, e.g. mailto:, are not pages
 
 # ------- Functions ------- #
 def connect_to_bucket(bucket_name: str) -> storage.Bucket:
@@ -62,143 +86,448 @@ def get_files_in_local_dir(local_dir: str) -> list[str]:
         exit()
     return [os.path.join(local_dir, filename) for filename in os.listdir(local_dir)]
 
-def read_files(args: argparse.Namespace) -> list[str]:
+def get_shards_in_bucket(bucket: storage.Bucket, bucket_dir: str, concurrency: int = 32) -> list[Shard]:
+    """Get the packed shards in a specific directory within a bucket, with their indexes.
+    
+    Parameters:
+        bucket -- The bucket object
+        bucket_dir -- The directory within the bucket
+        concurrency -- The maximum number of index downloads in flight
+    Returns:
+        The shards in the directory, in name order
+    """
+    blobs = [blob for blob in get_files_in_bucket(bucket, bucket_dir) if is_shard(blob.name)]
+    indexes = dict(fetch_objects(bucket.name, [index_name(blob.name) for blob in blobs], concurrency, endpoint=storage_emulator_host))
+    return [Shard(blob, np.load(io.BytesIO(indexes[index_name(blob.name)]))) for blob in sorted(blobs, key=lambda blob: blob.name)]
+
+def read_files(args: argparse.Namespace) -> Union[list[str], list[Shard]]:
     """Get the files in a specific directory within a bucket or local directory.
     
     Parameters:
         args -- The command line arguments
     Returns:
-        The files in the directory
+        The files in the directory, or its packed shards with --shards
     """
-    if args.local:
+    if args.shards and args.local:
+        get_files_in_local_dir(local_dir) # Checks that the directory exists
+        return get_local_shards(local_dir)
+    elif args.shards:
+        return get_shards_in_bucket(connect_to_bucket(bucket_name), bucket_dir, args.concurrency)
+    elif args.local:
         return get_files_in_local_dir(local_dir)
     else:
         bucket = connect_to_bucket(bucket_name)
         return get_files_in_bucket(bucket, bucket_dir)
 
-def get_links_from_blob(blob: storage.Blob) -> list[str]:
-    """Get links from a blob.
+def clean_file(file: Union[storage.Blob, str]) -> str:
+    """Cleanup the file name.
     
     Parameters:
-        blob -- The blob object
+        file -- The file to be cleaned
     Returns:
-        A list of links
+        The cleaned up file name
     """
-    with blob.open("r") as file:
-        html_content = file.read()
-        href_pattern = r'<a\s+HREF="([^"]+)">' # Matches <a HREF="link">
-        return re.findall(href_pattern, html_content)
+    if isinstance(file, storage.Blob):
+        file = file.name
+    # Extract the numeric part of the file name
+    file_name = os.path.basename(file)
+    file_name = os.path.splitext(file_name)[0]  # Remove the file extension
+    return file_name
+
+def build_graph(sources: npt.NDArray[np.int32], targets: npt.NDArray[np.int32], num_nodes: int) -> sparse.csr_matrix:
+    """Build a sparse adjacency matrix from an edge list.
     
-def get_links_from_file(file_path: str) -> list[str]:
-    """Get links from a file.
+    Parameters:
+        sources -- The source index of each edge
+        targets -- The target index of each edge
+        num_nodes -- The number of nodes in the graph
+    Returns:
+        The adjacency matrix in CSR format, one row per source
+    """
+    data = np.ones(len(sources), dtype=np.int8)
+    adjacency_matrix = sparse.csr_matrix((data, (sources, targets)), shape=(num_nodes, num_nodes))
+    adjacency_matrix.sum_duplicates()
+    adjacency_matrix.data[:] = 1 # Collapse duplicate links into a single edge
+    return adjacency_matrix
+
+def out_degrees(adjacency_matrix: sparse.csr_matrix) -> npt.NDArray[np.int64]:
+    """Get the number of outgoing links for each node.
     
     Parameters:
-        file_path -- The file path
+        adjacency_matrix -- The adjacency matrix
     Returns:
-        A list of links
+        The out-degree of each node
     """
-    with open(file_path, "r") as file:
-        html_content = file.read()
-        href_pattern = r'<a\s+HREF="([^"]+)">' # Matches <a HREF="link">
-        return re.findall(href_pattern, html_content)
+    return np.diff(adjacency_matrix.indptr) # The row lengths of a CSR matrix are the out-degrees
+
+def in_degrees(adjacency_matrix: sparse.csr_matrix) -> npt.NDArray[np.int64]:
+    """Get the number of incoming links for each node.
     
-def get_links(source: Union[storage.Blob, str]) -> list[str]:
-    """Get links from a blob or file.
+    Parameters:
+        adjacency_matrix -- The adjacency matrix
+    Returns:
+        The in-degree of each node
+    """
+    return np.bincount(adjacency_matrix.indices, minlength=adjacency_matrix.shape[1])
+
+def scan_links(content: Union[bytes, mmap.mmap]) -> npt.NDArray[np.int32]:
+    """Scan raw page bytes for the numeric targets of its links.
     
     Parameters:
-        source -- The blob or file
+        content -- The bytes of the page, e.g. a memory-mapped file
     Returns:
-        A list of links
+        The target index of each link
     """
-    if isinstance(source, storage.Blob):
-        return get_links_from_blob(source)
-    else:
-        return get_links_from_file(source)
+    matches = LINK_PATTERN.findall(content)
+    return np.array(matches, dtype=np.bytes_).astype(np.int32) if matches else np.empty(0, dtype=np.int32)
+
+def scan_files(file_paths: list[str]) -> tuple[npt.NDArray[np.int32], npt.NDArray[np.int32]]:
+    """Scan a batch of local files for their outgoing edges.
+    
+    Each file is memory-mapped and scanned as bytes, and the numeric targets of the
+    whole batch are converted to integers in a single call.
+    
+    Parameters:
+        file_paths -- The file paths
+    Returns:
+        The source and target index of each edge, with duplicate links collapsed
+    """
+    sources, matches, counts = [], [], []
+    for file_path in file_paths:
+        with open(file_path, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                continue
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                found = LINK_PATTERN.findall(content)
+        sources.append(int(clean_file(file_path)))
+        matches.extend(found)
+        counts.append(len(found))
         
-def clean_file(file: Union[storage.Blob, str]) -> str:
-    """Cleanup the file name.
+    return edges_from_matches(sources, matches, counts)
+
+def edges_from_matches(sources: list[int], matches: list[bytes], counts: list[int]) -> tuple[npt.NDArray[np.int32], npt.NDArray[np.int32]]:
+    """Convert the link matches of a batch of pages into an edge list in a single call.
     
     Parameters:
-        file -- The file to be cleaned
+        sources -- The index of each page
+        matches -- The numeric targets matched in all the pages, page after page
+        counts -- The number of matches of each page
     Returns:
-        The cleaned up file name
+        The source and target index of each edge, with duplicate links collapsed
     """
-    if isinstance(file, storage.Blob):
-        file = file.name
-    # Extract the numeric part of the file name
-    file_name = os.path.basename(file)
-    file_name = os.path.splitext(file_name)[0]  # Remove the file extension
-    return file_name
+    if not matches:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32)
+    targets = np.array(matches, dtype=np.bytes_).astype(np.int32)
+    return dedupe_edges(np.repeat(np.asarray(sources, dtype=np.int32), counts), targets)
 
-# Construct the adjacency matrix without multithreading
-# def construct_adjacency_matrix(files: list[str]) -> npt.NDArray[np.float64]:
-#     """Construct an adjacency matrix for the files.
-    
-#     Parameters:
-#         files -- The list of files
-#     Returns:
-#         The adjacency matrix
-#     """
-#     print("Creating adjacency matrix...\n")
-#     num_files = len(files)
-#     adjacency_matrix = np.zeros((num_files, num_files))
-
-#     for file_path in tqdm(files):
-#         links = get_links(file_path)
-        
-#         # Clean the files and links to get the indices
-#         source_file = clean_file(file_path)
-#         links = [clean_file(link) for link in links]
-        
-#         # Update the adjacency matrix
-#         source_file_index = int(source_file)
-#         for link in links:
-#             link_index = int(link)
-#             adjacency_matrix[source_file_index][link_index] = 1
-            
-#     return adjacency_matrix
+def scan_pages(content: Union[bytes, mmap.mmap], index: npt.NDArray, base: int = 0) -> tuple[npt.NDArray[np.int32], npt.NDArray[np.int32]]:
+    """Scan the pages of a packed shard, or of a byte range of one, for their outgoing edges.
+    
+    Each page is matched in place between its offsets, without copying it out of the shard.
+    
+    Parameters:
+        content -- The bytes of the shard or range, e.g. a memory-mapped shard
+        index -- The index rows of the pages in the content
+        base -- The offset in the shard of the first byte of the content
+    Returns:
+        The source and target index of each edge, with duplicate links collapsed
+    """
+    sources, matches, counts = [], [], []
+    for page, offset, length in index.tolist():
+        found = LINK_PATTERN.findall(content, offset - base, offset - base + length)
+        sources.append(page)
+        matches.extend(found)
+        counts.append(len(found))
+    return edges_from_matches(sources, matches, counts)
 
-def process_file(file_path: str, adjacency_matrix: npt.NDArray[np.float64]) -> None:
-    """Process a file to update the adjacency matrix.
+def scan_shard(shard: Shard) -> tuple[npt.NDArray[np.int32], npt.NDArray[np.int32]]:
+    """Scan a local packed shard for its outgoing edges.
     
     Parameters:
-        file_path -- The file path
-        adjacency_matrix -- The adjacency matrix
+        shard -- The shard
+    Returns:
+        The source and target index of each edge, with duplicate links collapsed
     """
-    links = get_links(file_path)
+    with open(shard.source, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return edges_from_matches([], [], [])
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            return scan_pages(content, shard.index)
+
+def scan_named_content(name: str, content: Union[bytes, mmap.mmap]) -> tuple[str, list[str]]:
+    """Scan a page for the names of the pages it links to.
     
-    # Clean the files and links to get the indices
-    source_file = clean_file(file_path)
-    links = [clean_file(link) for link in links]
+    Parameters:
+        name -- The file path or blob name of the page
+        content -- The bytes of the page
+    Returns:
+        The name of the page and the names of its link targets
+    """
+    source = file_page_name(name)
+    links = (link.decode("utf-8", errors="replace") for link in NAMED_LINK_PATTERN.findall(content))
+    targets = [page_name(link, source) for link in links if urlsplit(link).scheme.lower() in WEB_SCHEMES]
+    return source, [target for target in targets if target] # Drops links to nothing, e.g. href="#top" on a numbered page
+
+def scan_named_files(file_paths: list[str]) -> list[tuple[str, list[str]]]:
+    """Scan a batch of local files for the names of their pages and link targets.
     
-    # Update the adjacency matrix
-    source_file_index = int(source_file)
-    for link in links:
-        link_index = int(link)
-        adjacency_matrix[source_file_index][link_index] = 1
+    Parameters:
+        file_paths -- The file paths
+    Returns:
+        The name and link target names of each page
+    """
+    pages = []
+    for file_path in file_paths:
+        with open(file_path, "rb") as file:
+            pages.append(scan_named_content(file_path, file.read()))
+    return pages
 
-def construct_adjacency_matrix(files: list[str]) -> npt.NDArray[np.float64]:
-    """Construct an adjacency matrix for the files using multithreading.
+def intern_edges(pages: list[tuple[str, list[str]]], name_table: NameTable) -> tuple[npt.NDArray[np.int32], npt.NDArray[np.int32]]:
+    """Intern the names of a batch of pages and their link targets into an edge list.
     
     Parameters:
-        files -- The list of files
+        pages -- The name and link target names of each page
+        name_table -- The table the new names are added to
     Returns:
-        The adjacency matrix
+        The source and target index of each edge, with duplicate links collapsed
+    """
+    sources = np.array([name_table.intern(source) for source, _ in pages], dtype=np.int32)
+    targets = name_table.intern_many(target for _, links in pages for target in links)
+    return dedupe_edges(np.repeat(sources, [len(links) for _, links in pages]), targets)
+
+def merge_edges(edges: list[tuple[npt.NDArray[np.int32], npt.NDArray[np.int32]]]) -> tuple[npt.NDArray[np.int32], npt.NDArray[np.int32]]:
+    """Merge a list of edge arrays into a single pair of arrays.
+    
+    Parameters:
+        edges -- The (sources, targets) pairs to merge
+    Returns:
+        The merged source and target arrays
+    """
+    if not edges:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32)
+    sources, targets = zip(*edges)
+    return np.concatenate(sources), np.concatenate(targets)
+
+def fetch_edges(blobs: list[storage.Blob], concurrency: int = 32) -> Iterator[tuple[npt.NDArray[np.int32], npt.NDArray[np.int32]]]:
+    """Download blobs in bulk and parse each one as soon as it arrives.
+    
+    Parameters:
+        blobs -- The list of blobs
+        concurrency -- The maximum number of downloads in flight
+    Returns:
+        An iterator of the edge arrays of each blob
+    """
+    bucket = blobs[0].bucket.name
+    for name, content in fetch_objects(bucket, [blob.name for blob in blobs], concurrency, endpoint=storage_emulator_host):
+        targets = scan_links(content)
+        yield dedupe_edges(np.full(len(targets), int(clean_file(name)), dtype=np.int32), targets)
+
+def fetch_shard_edges(shards: list[Shard], concurrency: int = 32, range_size: int = 8 << 20) -> Iterator[tuple[npt.NDArray[np.int32], npt.NDArray[np.int32]]]:
+    """Download shard blobs in byte ranges and parse each range as soon as it arrives.
+    
+    Parameters:
+        shards -- The shards, with blobs as sources
+        concurrency -- The maximum number of ranged reads in flight
+        range_size -- The target number of bytes of a ranged read
+    Returns:
+        An iterator of the edge arrays of each range
+    """
+    bucket = shards[0].source.bucket.name
+    ranges = {}
+    for shard in shards:
+        for start, end, index in page_ranges(shard.index, range_size):
+            ranges[shard.source.name, start, end] = index
+    
+    for (name, start, end), content in tqdm(fetch_ranges(bucket, ranges, concurrency, endpoint=storage_emulator_host), total=len(ranges)):
+        yield scan_pages(content, ranges[name, start, end], start)
+
+def iter_named_pages(
+    files: list[Union[storage.Blob, str]],
+    executor: str = "thread",
+    workers: Optional[int] = None,
+    chunk_size: int = 256,
+    concurrency: int = 32,
+) -> Iterator[list[tuple[str, list[str]]]]:
+    """Parse the files into batches of page and link target names as they complete.
+    
+    Parameters:
+        files -- The list of blobs or files
+        executor -- The pool to parse local files with, "thread" or "process"
+        workers -- The number of workers, one per CPU if not given
+        chunk_size -- The number of files handed to a worker at a time
+        concurrency -- The maximum number of blob downloads in flight
+    Returns:
+        An iterator of batches of (page name, link target names)
+    """
+    num_files = len(files)
+    if files and isinstance(files[0], storage.Blob):
+        bucket = files[0].bucket.name
+        downloads = fetch_objects(bucket, [blob.name for blob in files], concurrency, endpoint=storage_emulator_host)
+        yield from ([scan_named_content(name, content)] for name, content in tqdm(downloads, total=num_files))
+        return
+    
+    pool = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+    chunks = [files[i:i + chunk_size] for i in range(0, num_files, chunk_size)]
+    with pool(max_workers=workers or os.cpu_count()) as pool_executor, tqdm(total=num_files) as progress:
+        for chunk, pages in zip(chunks, pool_executor.map(scan_named_files, chunks)):
+            progress.update(len(chunk))
+            yield pages
+
+def iter_edges(
+    files: Union[list[Union[storage.Blob, str]], list[Shard]],
+    executor: str = "thread",
+    workers: Optional[int] = None,
+    chunk_size: int = 256,
+    concurrency: int = 32,
+    name_table: Optional[NameTable] = None,
+) -> Iterator[tuple[npt.NDArray[np.int32], npt.NDArray[np.int32]]]:
+    """Parse the files into batches of edges as they complete.
+    
+    Blobs are downloaded in bulk and parsed as they arrive, local files are parsed
+    in chunks by a thread or process pool. Packed shards are parsed one shard per
+    task locally, and in byte ranges from the bucket. With a name table, pages and
+    links are matched by name instead of by number and interned as they arrive.
+    
+    Parameters:
+        files -- The list of blobs, files or packed shards
+        executor -- The pool to parse local files with, "thread" or "process"
+        workers -- The number of workers, one per CPU if not given
+        chunk_size -- The number of files handed to a worker at a time
+        concurrency -- The maximum number of blob downloads in flight
+        name_table -- The table of page names to intern, pages are numbered by their file names if not given (not for packed shards)
+    Returns:
+        An iterator of (sources, targets) batches, with duplicate links collapsed
     """
-    print("Creating adjacency matrix...\n")
     num_files = len(files)
-    adjacency_matrix = np.zeros((num_files, num_files))
+    
+    if name_table is not None:
+        # The workers only match names, the IDs are handed out here in arrival order
+        for pages in iter_named_pages(files, executor, workers, chunk_size, concurrency):
+            yield intern_edges(pages, name_table)
+        return
+    if files and isinstance(files[0], Shard) and isinstance(files[0].source, storage.Blob):
+        yield from fetch_shard_edges(files, concurrency)
+        return
+    if files and isinstance(files[0], Shard):
+        pool = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+        with pool(max_workers=workers or os.cpu_count()) as pool_executor:
+            yield from tqdm(pool_executor.map(scan_shard, files), total=num_files)
+        return
+    if files and isinstance(files[0], storage.Blob):
+        yield from tqdm(fetch_edges(files, concurrency), total=num_files)
+        return
+    
+    # Threads suit I/O bound reads, processes the CPU bound parsing of local files
+    pool = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+    chunks = [files[i:i + chunk_size] for i in range(0, num_files, chunk_size)]
+
+    with pool(max_workers=workers or os.cpu_count()) as pool_executor, tqdm(total=num_files) as progress:
+        # Each worker returns compact edge arrays for its chunk
+        for chunk, chunk_edges in zip(chunks, pool_executor.map(scan_files, chunks)):
+            progress.update(len(chunk))
+            yield chunk_edges
+
+def count_nodes(files: Union[list[Union[storage.Blob, str]], list[Shard]], name_table: Optional[NameTable] = None) -> int:
+    """Get the number of nodes of the graph of some files or packed shards.
+    
+    Parameters:
+        files -- The list of blobs, files or packed shards
+        name_table -- The table of page names, if the pages are interned by name
+    Returns:
+        The number of files, the number of pages in the shards, or the number of interned names
+    """
+    if name_table is not None:
+        return len(name_table)
+    if files and isinstance(files[0], Shard):
+        return count_pages(files)
+    return len(files)
 
-    # Create a thread pool with a maximum of 4 threads (you can adjust this number)
-    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
-        # Use executor.map to concurrently process the list of files
-        # Pass the adjacency_matrix as an additional argument
-        for _ in tqdm(executor.map(process_file, files, [adjacency_matrix] * len(files)), total=len(files)):
-            pass
+def run_pages(files: list[Union[storage.Blob, str]], adjacency_matrix: sparse.csr_matrix, name_table: NameTable) -> npt.NDArray[np.int32]:
+    """Get the IDs of the pages of a run, its stored pages and the pages they link to.
+    
+    Parameters:
+        files -- The list of blobs or files
+        adjacency_matrix -- The adjacency matrix over all the IDs of the name table
+        name_table -- The table of page names
+    Returns:
+        The sorted page IDs
+    """
+    stored = np.array([name_table.lookup(file_page_name(file if isinstance(file, str) else file.name)) for file in files], dtype=np.int32)
+    return np.union1d(stored, adjacency_matrix.indices).astype(np.int32)
 
+def construct_adjacency_matrix(
+    files: Union[list[Union[storage.Blob, str]], list[Shard]],
+    executor: str = "thread",
+    workers: Optional[int] = None,
+    chunk_size: int = 256,
+    concurrency: int = 32,
+    cache_dir: Optional[str] = None,
+    counter: Optional[DegreeCounter] = None,
+    name_table: Optional[NameTable] = None,
+) -> sparse.csr_matrix:
+    """Construct a sparse adjacency matrix for the files.
+    
+    With a cache directory, only the files whose generation (or mtime and size) changed
+    since the last run are parsed again, and an unchanged corpus is loaded straight from
+    the memory-mapped cache. A cache written with other page IDs, by file number instead
+    of by name or with another name table, is parsed again in full.
+    
+    Parameters:
+        files -- The list of blobs, files or packed shards
+        executor -- The pool to parse local files with, "thread" or "process"
+        workers -- The number of workers, one per CPU if not given
+        chunk_size -- The number of files handed to a worker at a time
+        concurrency -- The maximum number of blob downloads in flight
+        cache_dir -- The edge cache directory, no caching if not given (not for packed shards)
+        counter -- Degree counters updated with every edge as it is parsed (not with a name table, the number of nodes is only known after parsing)
+        name_table -- The table of page names to intern, pages are numbered by their file names if not given
+    Returns:
+        The adjacency matrix in CSR format
+    """
+    print("Creating adjacency matrix...\n")
+    num_files = len(files)
+    if name_table is not None:
+        # Number the stored pages first, in listing order, and their link targets as they are found
+        name_table.intern_many(file_page_name(file if isinstance(file, str) else file.name) for file in files)
+        counter = None
+    else:
+        counter = counter or DegreeCounter(count_nodes(files))
+    count = counter.count if counter is not None else iter
+    if cache_dir is None:
+        edges = merge_edges(list(count(iter_edges(files, executor, workers, chunk_size, concurrency, name_table))))
+        return build_graph(*edges, count_nodes(files, name_table))
+    
+    names, stamps, sizes = zip(*(file_key(file) for file in files)) if files else ((), (), ())
+    if name_table is not None:
+        sources = np.array([name_table.lookup(file_page_name(name)) for name in names], dtype=np.int32)
+    else:
+        sources = np.array([int(clean_file(name)) for name in names], dtype=np.int32)
+    cache = load_edge_cache(cache_dir)
+    if cache is not None and not same_id_space(cache, name_table):
+        print("The edge cache was written with other page IDs, parsing every file again.\n")
+        cache = None
+    matches = match_cache(cache, names, stamps, sizes)
+    stale = np.flatnonzero(matches < 0)
+    
+    # Nothing changed, use the cached arrays as they are
+    num_nodes = count_nodes(files, name_table)
+    if cache is not None and len(stale) == 0 and len(cache.names) == num_files and len(cache.indptr) == num_nodes + 1:
+        print(f"Loaded {num_files} files from cache.\n")
+        if counter is not None:
+            counter.add_csr(cache.indptr, cache.indices)
+        return cached_graph(cache, num_nodes)
+    
+    print(f"Loaded {num_files - len(stale)} files from cache, parsing {len(stale)}...\n")
+    kept_edges = cached_edges(cache, sources[matches >= 0]) if cache is not None else merge_edges([])
+    if counter is not None:
+        counter.add(*kept_edges)
+    new_edges = merge_edges(list(count(iter_edges([files[i] for i in stale], executor, workers, chunk_size, concurrency, name_table))))
+    adjacency_matrix = build_graph(*merge_edges([kept_edges, new_edges]), count_nodes(files, name_table))
+    
+    save_edge_cache(cache_dir, names, stamps, sizes, sources, adjacency_matrix, name_table)
     return adjacency_matrix
 
-def calculate_statistics(adjacency_matrix: npt.NDArray[np.float64]) -> dict[str, dict[str, float]]:
+def calculate_statistics(adjacency_matrix: sparse.csr_matrix) -> dict[str, dict[str, float]]:
     """Calculate statistics for incoming and outgoing links.
     
     Parameters:
@@ -206,72 +535,520 @@ def calculate_statistics(adjacency_matrix: npt.NDArray[np.float64]) -> dict[str,
     Returns:
         A dictionary of statistics
     """    
-    incoming_links = np.sum(adjacency_matrix, axis=0)
-    outgoing_links = np.sum(adjacency_matrix, axis=1)
-    
-    # Store the statistics in a dictionary for easy access later
-    statistics = {
-        "Incoming Links": {
-            "Average:": np.mean(incoming_links),
-            "Median:": np.median(incoming_links),
-            "Max:": np.max(incoming_links),
-            "Min:": np.min(incoming_links),
-            "Quintiles:": np.quantile(incoming_links, [0.2, 0.4, 0.6, 0.8, 1.0]),
-        },
-        "Outgoing Links": {
-            "Average:": np.mean(outgoing_links),
-            "Median:": np.median(outgoing_links),
-            "Max:": np.max(outgoing_links),
-            "Min:": np.min(outgoing_links),
-            "Quintiles:": np.quantile(outgoing_links, [0.2, 0.4, 0.6, 0.8, 1.0]),
-        },
-    }
-    
-    return statistics
-
-def calculate_pagerank(adjacency_matrix: npt.NDArray[np.float64], damping_factor: float = 0.85, epsilon: float = 0.005) -> npt.NDArray[np.float64]:
-    """
-    Calculate the PageRank for each page in a web graph.
+    return summarize_degrees(in_degrees(adjacency_matrix), out_degrees(adjacency_matrix))
+
+def degree_statistics(incoming_links: npt.ArrayLike, outgoing_links: npt.ArrayLike, method: str = "exact", relative_accuracy: float = 0.01) -> dict[str, dict[str, float]]:
+    """Calculate statistics for incoming and outgoing links from the degree counts.
+    
+    Parameters:
+        incoming_links -- The in-degree of each node
+        outgoing_links -- The out-degree of each node
+        method -- "exact" to sort the degrees, "sketch" to stream them through a quantile sketch
+        relative_accuracy -- The relative accuracy of the sketched quantiles
+    Returns:
+        A dictionary of statistics
+    """
+    if method == "sketch":
+        return summarize_sketches(sketch_degrees(incoming_links, relative_accuracy), sketch_degrees(outgoing_links, relative_accuracy))
+    return summarize_degrees(incoming_links, outgoing_links)
+
+def build_transition_matrix(adjacency_matrix: sparse.csr_matrix) -> tuple[sparse.csr_matrix, npt.NDArray[np.bool_]]:
+    """Build the column-stochastic transition matrix used by the PageRank iteration.
+    
+    Parameters:
+        adjacency_matrix -- The adjacency matrix
+    Returns:
+        The transposed transition matrix (one row per target) and a mask of the dangling nodes
+    """
+    outgoing_links = out_degrees(adjacency_matrix)
+    dangling_nodes = outgoing_links == 0
+    
+    # Scale every row by 1 / out-degree, leaving the rows of dangling nodes empty
+    inverse_out_degrees = np.zeros(len(outgoing_links))
+    inverse_out_degrees[~dangling_nodes] = 1.0 / outgoing_links[~dangling_nodes]
+    transition_matrix = sparse.diags(inverse_out_degrees) @ adjacency_matrix.astype(np.float64)
+    
+    return transition_matrix.T.tocsr(), dangling_nodes
+
+def normalize_vector(vector: Optional[npt.ArrayLike], num_nodes: int) -> npt.NDArray[np.float64]:
+    """Normalize a teleport or dangling vector so that it sums to one.
+    
+    Parameters:
+        vector -- The vector to normalize, or None for the uniform vector
+        num_nodes -- The number of nodes in the graph
+    Returns:
+        The normalized vector
+    """
+    if vector is None:
+        return np.full(num_nodes, 1.0 / num_nodes)
+    vector = np.asarray(vector, dtype=np.float64)
+    if vector.shape != (num_nodes,) or vector.min() < 0 or vector.sum() <= 0:
+        raise ValueError("Vector must be non-negative, non-zero and have one entry per node.")
+    return vector / vector.sum()
+
+def calculate_pagerank(
+    adjacency_matrix: sparse.csr_matrix,
+    damping_factor: float = 0.85,
+    epsilon: float = 1e-8,
+    norm: Union[int, float] = 1,
+    max_iterations: int = 200,
+    personalization: Optional[npt.ArrayLike] = None,
+    dangling: Optional[npt.ArrayLike] = None,
+    initial: Optional[npt.ArrayLike] = None,
+    solver: str = "jacobi",
+    callback: Optional[IterationCallback] = None,
+    spmv_workers: int = 0,
+    ordering: str = "none",
+) -> npt.NDArray[np.float64]:
+    """
+    Calculate the PageRank for each page in a web graph using a sparse iterative solver.
     
     Parameters:
         adjacency_matrix -- The adjacency matrix
         damping_factor -- The damping factor
-        epsilon -- The epsilon value
+        epsilon -- The convergence tolerance on the change between iterations
+        norm -- The norm used to measure the change between iterations (1, 2 or np.inf)
+        max_iterations -- The maximum number of iterations
+        personalization -- The teleport vector, uniform if not given
+        dangling -- The distribution of the rank of dangling nodes, the teleport vector if not given
+        initial -- The starting PageRank values, e.g. the ranks of a previous run, uniform if not given
+        solver -- The solver, "jacobi" (power iteration), "gauss-seidel" or "extrapolation" (quadratic extrapolation)
+        callback -- Called after every iteration with the iteration, residual and elapsed seconds
+        spmv_workers -- The number of processes sharing each sparse mat-vec, single-threaded if 0
+        ordering -- Relabel the nodes before iterating, "none", "degree", "rcm" or "bfs"
         
     Returns:
         The PageRank values
     """
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown solver {solver}, expected one of {', '.join(SOLVERS)}.")
     print("\nCalculating PageRank...\n")
     num_nodes = adjacency_matrix.shape[0]
-    current_pagerank = np.ones(num_nodes) / num_nodes # Normalize the initial PageRank values
     
-    # Create and populate a dictionary of incoming nodes for each node
-    incoming_nodes = {}
-    for i in range(num_nodes):
-        incoming_nodes[i] = np.where(adjacency_matrix[:, i] == 1)[0]
+    # Iterate over relabeled nodes so that linked pages sit close together in the rank vector
+    order = node_order(adjacency_matrix, ordering)
+    if order is not None:
+        adjacency_matrix = permute_graph(adjacency_matrix, order)
+        personalization, dangling, initial = (permute_vector(vector, order) for vector in (personalization, dangling, initial))
+    
+    transition_matrix, dangling_nodes = build_transition_matrix(adjacency_matrix)
+    teleport = normalize_vector(personalization, num_nodes)
+    dangling_weights = teleport if dangling is None else normalize_vector(dangling, num_nodes)
+    current_pagerank = normalize_vector(initial, num_nodes) # Normalize the initial PageRank values
+    
+    if spmv_workers and solver == "gauss-seidel":
+        print("WARNING: The gauss-seidel sweeps are sequential, ignoring --spmv-workers.")
+        spmv_workers = 0
+    
+    # Share the matrix with a pool of processes that each multiply a range of its rows
+    matrix = SharedMatVec(transition_matrix, spmv_workers) if spmv_workers else transition_matrix
+    try:
+        make_step = gauss_seidel_step if solver == "gauss-seidel" else jacobi_step
+        step = make_step(matrix, dangling_nodes, teleport, dangling_weights, damping_factor)
+        extrapolation_period = EXTRAPOLATION_PERIOD if solver == "extrapolation" else 0
+        
+        current_pagerank, converged = solve(step, current_pagerank, epsilon, norm, max_iterations, callback, extrapolation_period)
+    finally:
+        if spmv_workers:
+            matrix.close()
+    if not converged:
+        print(f"WARNING: PageRank did not converge after {max_iterations} iterations.")
+    
+    if order is not None:
+        current_pagerank = restore_vector(current_pagerank, order) # Back to the original node IDs
+    
+    return current_pagerank / np.sum(current_pagerank) # Normalize the PageRank values on return
+        
+def seed_matrix(seed_sets: list[list[int]], num_nodes: int) -> sparse.csc_matrix:
+    """Build a sparse matrix of personalization vectors from seed sets.
+    
+    Parameters:
+        seed_sets -- The seed pages of each personalization
+        num_nodes -- The number of nodes in the graph
+    Returns:
+        An N x K matrix whose k-th column is uniform over the k-th seed set
+    """
+    rows = np.concatenate([np.unique(np.asarray(seeds, dtype=np.int64)) for seeds in seed_sets]) if seed_sets else np.empty(0, dtype=np.int64)
+    columns = np.repeat(np.arange(len(seed_sets)), [len(np.unique(seeds)) for seeds in seed_sets])
+    return sparse.csc_matrix((np.ones(len(rows)), (rows, columns)), shape=(num_nodes, len(seed_sets)))
+
+def calculate_personalized_pagerank(
+    adjacency_matrix: sparse.csr_matrix,
+    personalization: Union[npt.ArrayLike, sparse.spmatrix],
+    damping_factor: float = 0.85,
+    epsilon: float = 1e-8,
+    max_iterations: int = 200,
+) -> npt.NDArray[np.float64]:
+    """
+    Calculate many personalized PageRanks of the same graph in one pass.
+    
+    Every iteration multiplies the sparse transition matrix by the dense block of
+    rank vectors that have not converged yet, so K personalizations cost about one
+    multi-vector solve instead of K separate ones. The rank of dangling nodes of
+    each column is redistributed along its own personalization vector.
+    
+    Parameters:
+        adjacency_matrix -- The adjacency matrix
+        personalization -- An N x K matrix, dense or sparse, with one teleport vector per column
+        damping_factor -- The damping factor
+        epsilon -- The convergence tolerance on the L1 change of each column
+        max_iterations -- The maximum number of iterations
         
-    # Similarly as above, create and populate a dictionary of the sum of outgoing nodes for each node
-    sum_of_outgoing_nodes = {}
-    for elem in incoming_nodes:
-        sum_of_outgoing_nodes[elem] = adjacency_matrix[elem].sum()
+    Returns:
+        An N x K matrix with the PageRank values of each personalization per column
+    """
+    print("\nCalculating personalized PageRank...\n")
+    num_nodes = adjacency_matrix.shape[0]
+    transition_matrix, dangling_nodes = build_transition_matrix(adjacency_matrix)
+    
+    teleport = sparse.coo_matrix(personalization, dtype=np.float64)
+    teleport.sum_duplicates()
+    column_sums = np.asarray(teleport.sum(axis=0)).ravel()
+    if teleport.ndim != 2 or teleport.shape[0] != num_nodes or (teleport.data < 0).any() or (column_sums <= 0).any():
+        raise ValueError("Personalization must be a non-negative N x K matrix with no empty column.")
+    
+    # Seed sets make the teleport matrix very sparse, so only its non-zeros are touched each iteration
+    num_columns = teleport.shape[1]
+    teleport_rows, teleport_columns = teleport.row, teleport.col
+    teleport_values = teleport.data / column_sums[teleport.col]
+    
+    pageranks = np.empty((num_nodes, num_columns))
+    columns = np.arange(num_columns)
+    current_block = np.zeros((num_nodes, num_columns))
+    current_block[teleport_rows, teleport_columns] = teleport_values
+    for _ in range(max_iterations):
+        # One sparse matrix x dense block product over the columns that have not converged yet
+        dangling_rank = current_block[dangling_nodes].sum(axis=0)
+        next_block = transition_matrix @ current_block
+        next_block *= damping_factor
+        next_block[teleport_rows, teleport_columns] += teleport_values * (damping_factor * dangling_rank + 1 - damping_factor)[teleport_columns]
         
-    while True:
-        prev_pagerank = current_pagerank.copy()
+        # Measure the change of each column in place, the previous block is not needed anymore
+        np.subtract(next_block, current_block, out=current_block)
+        errors = np.abs(current_block, out=current_block).sum(axis=0)
+        current_block = next_block
         
-        # Calculate the new PageRank values for each node
-        for i in range(num_nodes):
-            incoming_pagerank = 0
+        # Set the converged columns aside and keep iterating on the rest
+        converged = errors < epsilon
+        if converged.any():
+            pageranks[:, columns[converged]] = current_block[:, converged]
+            positions = np.cumsum(~converged) - 1 # New position of every remaining column
+            kept = ~converged[teleport_columns]
+            teleport_rows, teleport_columns, teleport_values = teleport_rows[kept], positions[teleport_columns[kept]], teleport_values[kept]
+            current_block, columns = current_block[:, ~converged], columns[~converged]
+        if len(columns) == 0:
+            break
+    else:
+        print(f"WARNING: {len(columns)} personalized PageRanks did not converge after {max_iterations} iterations.")
+        pageranks[:, columns] = current_block
+    
+    return pageranks / pageranks.sum(axis=0) # Normalize each column on return
+
+def load_previous_pagerank(path: str, num_nodes: int, damping_factor: float = 0.85, pages: Optional[npt.NDArray[np.int32]] = None) -> Optional[npt.NDArray[np.float64]]:
+    """Load the rank vector persisted by a previous run to warm-start from.
+    
+    Parameters:
+        path -- The path of the persisted rank vector
+        num_nodes -- The number of nodes in the current graph
+        damping_factor -- The damping factor
+        pages -- The page ID of each node if the pages are interned, the vector is then indexed by page ID
+    Returns:
+        The previous PageRank values resized to the current graph, or None if there are none
+    """
+    if not os.path.exists(path):
+        return None
+    previous_pagerank = np.load(path)
+    
+    # Pages added since the previous run start from their teleport share
+    initial = np.full(num_nodes, (1 - damping_factor) / num_nodes)
+    if pages is None:
+        overlap = min(num_nodes, len(previous_pagerank))
+        initial[:overlap] = previous_pagerank[:overlap]
+    else:
+        known = pages < len(previous_pagerank)
+        initial[known] = np.where(previous_pagerank[pages[known]] > 0, previous_pagerank[pages[known]], initial[known])
+    return initial / initial.sum()
+
+def update_pagerank(
+    adjacency_matrix: sparse.csr_matrix,
+    previous_pagerank: npt.ArrayLike,
+    damping_factor: float = 0.85,
+    epsilon: float = 1e-8,
+    max_rounds: int = 10000,
+    max_frontier: float = 0.1,
+) -> npt.NDArray[np.float64]:
+    """
+    Update the PageRank of a changed graph by pushing the residual of the previous ranks.
+    
+    This is the forward push of Andersen, Chung and Lang: a node is pushed only while its
+    residual is above its share of epsilon, in proportion to its out-degree, so the residual
+    left over all nodes is at most epsilon in L1, as for the power iteration. The residual
+    of the previous ranks on the new graph is only that large around the pages whose links
+    changed, so each round only touches the frontier and the targets of its links, instead
+    of the whole graph.
+    If the frontier grows beyond a fraction of the graph the change is not local, and the
+    power iteration is warm-started from the ranks pushed so far instead.
+    
+    Parameters:
+        adjacency_matrix -- The adjacency matrix of the changed graph
+        previous_pagerank -- The PageRank values of the previous graph
+        damping_factor -- The damping factor
+        epsilon -- The L1 norm of the residual allowed over all nodes
+        max_rounds -- The maximum number of push rounds
+        max_frontier -- The fraction of the nodes above which the power iteration is used instead
         
-            for j in incoming_nodes[i]:
-                incoming_pagerank += current_pagerank[j] / sum_of_outgoing_nodes[j]
-            current_pagerank[i] = (1 - damping_factor) + damping_factor * incoming_pagerank # From the PageRank formula
-            
-        # Check if the PageRank values have converged
-        if np.linalg.norm(current_pagerank - prev_pagerank) < epsilon:
+    Returns:
+        The PageRank values
+    """
+    print("\nUpdating PageRank...\n")
+    num_nodes = adjacency_matrix.shape[0]
+    transition_matrix, dangling_nodes = build_transition_matrix(adjacency_matrix)
+    outgoing_links = out_degrees(adjacency_matrix)
+    teleport = normalize_vector(None, num_nodes)
+    current_pagerank = normalize_vector(previous_pagerank, num_nodes)
+    
+    # The residual of the PageRank equation for the previous ranks, one full mat-vec
+    dangling_rank = current_pagerank[dangling_nodes].sum()
+    residual = damping_factor * (transition_matrix @ current_pagerank + dangling_rank * teleport)
+    residual += (1 - damping_factor) * teleport - current_pagerank
+    links = np.maximum(outgoing_links, 1) # A dangling node is allowed the residual of one link
+    link_epsilon = epsilon / links.sum()
+    cutoff = link_epsilon * links
+    frontier = np.flatnonzero(np.abs(residual) > cutoff)
+    
+    # The rank pushed from dangling nodes reaches every node, it is held back as a uniform
+    # share of the residual and only spread once it could lift a node over its cutoff
+    uniform = 0.0
+    touched = np.zeros(num_nodes, dtype=bool)
+    rounds = 0
+    for _ in range(max_rounds):
+        if len(frontier) == 0:
             break
+        if len(frontier) > max_frontier * num_nodes:
+            print(f"Push frontier of {len(frontier)} nodes is not local, iterating instead...")
+            return calculate_pagerank(adjacency_matrix, damping_factor=damping_factor, epsilon=epsilon, initial=current_pagerank)
+        touched[frontier] = True
+        rounds += 1
+        
+        # Push the residual of every frontier node along its outgoing links
+        pushed = residual[frontier] + uniform / num_nodes
+        current_pagerank[frontier] += pushed
+        residual[frontier] = -uniform / num_nodes
+        
+        linked = outgoing_links[frontier] > 0
+        rows = frontier[linked]
+        counts = outgoing_links[rows]
+        starts = np.repeat(adjacency_matrix.indptr[rows] - np.cumsum(counts) + counts, counts)
+        targets = adjacency_matrix.indices[starts + np.arange(counts.sum())]
+        np.add.at(residual, targets, np.repeat(damping_factor * pushed[linked] / counts, counts))
+        uniform += damping_factor * pushed[~linked].sum()
+        
+        # Only the targets of this round can have crossed their cutoff, unless the uniform share is spread
+        if abs(uniform) / num_nodes > link_epsilon / 2:
+            residual += uniform / num_nodes
+            uniform = 0.0
+            candidates = np.arange(num_nodes)
+        else:
+            candidates = np.unique(targets)
+        frontier = candidates[np.abs(residual[candidates] + uniform / num_nodes) > cutoff[candidates]]
+    else:
+        if len(frontier):
+            print(f"WARNING: PageRank update did not converge after {max_rounds} rounds.")
     
+    print(f"Pushed the residual of {int(touched.sum())} of {num_nodes} nodes in {rounds} rounds.")
     return current_pagerank / np.sum(current_pagerank) # Normalize the PageRank values on return
         
+def print_iteration(iteration: int, residual: float, elapsed: float) -> None:
+    """Print the convergence telemetry of a solver iteration.
+    
+    Parameters:
+        iteration -- The iteration number
+        residual -- The change since the previous iteration
+        elapsed -- The wall time since the solver started, in seconds
+    """
+    print(f"Iteration: {iteration}, Residual: {residual:.3e}, Time: {elapsed:.3f}s")
+
+def compare_with_networkx(
+    adjacency_matrix: sparse.csr_matrix,
+    pageranks: npt.NDArray[np.float64],
+    damping_factor: float = 0.85,
+    max_iterations: int = 200,
+) -> tuple[float, dict[int, float]]:
+    """Compare PageRank values with the ones calculated by NetworkX on the same graph.
+
+    NetworkX is run with a tight tolerance so that its own convergence error does not
+    count against the values being checked.
+
+    Parameters:
+        adjacency_matrix -- The adjacency matrix
+        pageranks -- The PageRank values to check
+        damping_factor -- The damping factor
+        max_iterations -- The maximum number of NetworkX iterations
+    Returns:
+        The largest absolute difference between the two and the NetworkX PageRank values
+    """
+    G = nx.from_scipy_sparse_array(adjacency_matrix, create_using=nx.DiGraph)
+    nx_pagerank_scores = nx.pagerank(G, alpha=damping_factor, max_iter=max_iterations, tol=1e-12)
+    nx_pageranks = np.array([nx_pagerank_scores[page] for page in range(len(pageranks))])
+    return float(np.max(np.abs(nx_pageranks - pageranks), initial=0.0)), nx_pagerank_scores
+
+def run_in_memory(
+    files: Union[list[Union[storage.Blob, str]], list[Shard]],
+    args: argparse.Namespace,
+    instrumentation: Optional[Instrumentation] = None,
+    name_table: Optional[NameTable] = None,
+) -> tuple[sparse.csr_matrix, dict[str, dict[str, float]], npt.NDArray[np.float64], Optional[npt.NDArray[np.int32]]]:
+    """Build the graph in memory and calculate its statistics and PageRank scores.
+    
+    With a name table, the graph only has a node for each page of this run, the stored
+    pages and the pages they link to, not for every name the table has ever seen.
+    
+    Parameters:
+        files -- The list of blobs, files or packed shards
+        args -- The command line arguments
+        instrumentation -- Records the time and memory of every phase, nothing if not given
+        name_table -- The table of page names to intern, pages are numbered by their file names if not given
+    Returns:
+        The adjacency matrix, the statistics, the PageRank values and the page ID of each node (None without a name table)
+    """
+    instrumentation = instrumentation or Instrumentation(enabled=False)
+    counter = DegreeCounter(count_nodes(files)) if name_table is None else None
+    with instrumentation.phase("construct_adjacency_matrix") as record:
+        adjacency_matrix = construct_adjacency_matrix(files, executor=args.executor, workers=args.workers, chunk_size=args.chunk_size, concurrency=args.concurrency, cache_dir=args.cache, counter=counter, name_table=name_table)
+        record["files"], record["edges"] = count_nodes(files), int(adjacency_matrix.nnz)
+    pages = None
+    if name_table is not None:
+        # Keep only the pages of this run, the IDs of the table cover every earlier run too
+        pages = run_pages(files, adjacency_matrix, name_table)
+        adjacency_matrix = adjacency_matrix[pages][:, pages].tocsr()
+    if counter is None:
+        # The interned graph is only sized once every link is parsed
+        counter = DegreeCounter(adjacency_matrix.shape[0])
+        counter.add_csr(adjacency_matrix.indptr, adjacency_matrix.indices)
+    with instrumentation.phase("calculate_statistics"):
+        statistics = degree_statistics(counter.incoming, counter.outgoing, args.statistics, args.sketch_accuracy)
+    
+    return adjacency_matrix, statistics, rank_in_memory(adjacency_matrix, args, instrumentation, pages), pages
+
+def run_from_parquet(
+    prefix: str,
+    args: argparse.Namespace,
+    instrumentation: Optional[Instrumentation] = None,
+) -> tuple[sparse.csr_matrix, dict[str, dict[str, float]], npt.NDArray[np.float64]]:
+    """Load the graph parsed by the hw7 pipeline and calculate its statistics and PageRank scores.
+    
+    Parameters:
+        prefix -- The --output prefix of the hw7 pipeline
+        args -- The command line arguments
+        instrumentation -- Records the time and memory of every phase, nothing if not given
+    Returns:
+        The adjacency matrix, the statistics and the PageRank values
+    """
+    print("Loading Parquet tables...\n")
+    instrumentation = instrumentation or Instrumentation(enabled=False)
+    with instrumentation.phase("load_parquet") as record:
+        incoming_links, outgoing_links = load_parquet_degrees(prefix)
+        adjacency_matrix = build_graph(*load_parquet_edges(prefix), len(incoming_links)) # The degree table has a row for every page
+        record["edges"] = int(adjacency_matrix.nnz)
+    with instrumentation.phase("calculate_statistics"):
+        statistics = degree_statistics(incoming_links, outgoing_links, args.statistics, args.sketch_accuracy)
+    
+    return adjacency_matrix, statistics, rank_in_memory(adjacency_matrix, args, instrumentation)
+
+def run_from_edge_list(
+    directory: str,
+    args: argparse.Namespace,
+    instrumentation: Optional[Instrumentation] = None,
+) -> tuple[sparse.csr_matrix, dict[str, dict[str, float]], npt.NDArray[np.float64]]:
+    """Load the ground-truth graph written by generate-content.py and calculate its statistics and PageRank scores.
+    
+    Nothing is read or parsed, so the run times the solver on its own.
+    
+    Parameters:
+        directory -- The --graph directory of generate-content.py
+        args -- The command line arguments
+        instrumentation -- Records the time and memory of every phase, nothing if not given
+    Returns:
+        The adjacency matrix, the statistics and the PageRank values
+    """
+    print("Loading edge list...\n")
+    instrumentation = instrumentation or Instrumentation(enabled=False)
+    with instrumentation.phase("load_edge_list") as record:
+        truth = load_graph(directory)
+        adjacency_matrix = build_graph(truth.sources, truth.targets, len(truth.incoming)) # The degree arrays have an entry for every page
+        record["edges"] = int(adjacency_matrix.nnz)
+    with instrumentation.phase("calculate_statistics"):
+        statistics = degree_statistics(truth.incoming, truth.outgoing, args.statistics, args.sketch_accuracy)
+    
+    return adjacency_matrix, statistics, rank_in_memory(adjacency_matrix, args, instrumentation)
+
+def check_edges(adjacency_matrix: sparse.csr_matrix, directory: str) -> bool:
+    """Check the parsed graph against the ground-truth graph written by generate-content.py.
+    
+    Parameters:
+        adjacency_matrix -- The adjacency matrix
+        directory -- The --graph directory of generate-content.py
+    Returns:
+        Whether the graphs have exactly the same nodes and edges
+    """
+    truth = load_graph(directory, mmap=True)
+    sources = np.repeat(np.arange(adjacency_matrix.shape[0], dtype=np.int32), out_degrees(adjacency_matrix))
+    missing, extra = compare_edges(sources, adjacency_matrix.indices, truth)
+    print(f"Nodes: {adjacency_matrix.shape[0]} parsed, {len(truth.incoming)} expected")
+    print(f"Edges: {adjacency_matrix.nnz} parsed, {len(truth.sources)} expected, {missing} missing, {extra} unexpected")
+    return missing == 0 and extra == 0 and adjacency_matrix.shape[0] == len(truth.incoming)
+
+def rank_in_memory(
+    adjacency_matrix: sparse.csr_matrix,
+    args: argparse.Namespace,
+    instrumentation: Optional[Instrumentation] = None,
+    pages: Optional[npt.NDArray[np.int32]] = None,
+) -> npt.NDArray[np.float64]:
+    """Calculate the PageRank scores of an in-memory graph, incrementally if asked to.
+    
+    Parameters:
+        adjacency_matrix -- The adjacency matrix
+        args -- The command line arguments
+        instrumentation -- Records the time and memory of every phase, nothing if not given
+        pages -- The page ID of each node if the pages are interned, the persisted ranks are then indexed by page ID
+    Returns:
+        The PageRank values
+    """
+    instrumentation = instrumentation or Instrumentation(enabled=False)
+    
+    # Start from the ranks of the previous run if there are any
+    previous_pagerank = None
+    if args.incremental:
+        previous_pagerank = load_previous_pagerank(args.incremental, adjacency_matrix.shape[0], args.damping, pages)
+    
+    with instrumentation.phase("calculate_pagerank") as record:
+        record["edges"] = int(adjacency_matrix.nnz)
+        if previous_pagerank is not None and args.update_method == "push":
+            pageranks = update_pagerank(adjacency_matrix, previous_pagerank, damping_factor=args.damping, epsilon=args.tolerance)
+        else:
+            pageranks = calculate_pagerank(
+                adjacency_matrix,
+                damping_factor=args.damping,
+                epsilon=args.tolerance,
+                norm=np.inf if args.norm == "inf" else int(args.norm),
+                max_iterations=args.max_iterations,
+                initial=previous_pagerank,
+                solver=args.solver,
+                callback=instrumentation.wrap_callback(print_iteration if args.telemetry else None),
+                spmv_workers=args.spmv_workers,
+                ordering=args.ordering,
+            )
+    
+    if args.incremental:
+        persisted = pageranks
+        if pages is not None:
+            # Pages missing from this run keep a rank of 0, so the IDs of later runs still line up
+            persisted = np.zeros(int(pages[-1]) + 1 if len(pages) else 0)
+            persisted[pages] = pageranks
+        replace_file(args.incremental, lambda file: np.save(file, persisted))
+    
+    return pageranks
+        
 # ------- Main ------- #    
 def main():
     # Enforce naming of local and bucket directories
@@ -283,17 +1060,101 @@ def main():
     parser = argparse.ArgumentParser(description="Analyze links in HTML files.")
     parser.add_argument("--local", action="store_true", help="Use local files instead of Google Cloud Storage.")
     parser.add_argument("--test", action="store_true", help="Run NetworkX for comparison testing.")
+    parser.add_argument("--test-tolerance", type=float, default=1e-6, help="The largest absolute difference from NetworkX that --test accepts.")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread", help="Parse files with a thread or process pool.")
+    parser.add_argument("--workers", type=int, default=None, help="The number of parsing workers (default: one per CPU).")
+    parser.add_argument("--chunk-size", type=int, default=256, help="The number of files handed to a parsing worker at a time.")
+    parser.add_argument("--concurrency", type=int, default=32, help="The maximum number of bucket downloads in flight.")
+    parser.add_argument("--shards", action="store_true", help="Read packed shards written by generate-content.py --shards instead of one file per page.")
+    parser.add_argument("--names", default=None, help="Path of the persisted name table (.npz), to match pages and links by name or URL instead of by number.")
+    parser.add_argument("--cache", default=None, help="Directory of the parsed edge cache, only changed files are parsed again.")
+    parser.add_argument("--incremental", default=None, help="Path of the persisted rank vector to warm-start from and update.")
+    parser.add_argument("--update-method", choices=["warm-start", "push"], default="warm-start", help="How --incremental updates the previous ranks.")
+    parser.add_argument("--out-of-core", default=None, help="Directory of the on-disk edge blocks, for graphs larger than memory.")
+    parser.add_argument("--parquet", default=None, help="The --output prefix of the hw7 pipeline, to load its Parquet edge and degree tables instead of reading the files.")
+    parser.add_argument("--edge-list", default=None, help="The --graph directory of generate-content.py, to load its edge list instead of reading the files.")
+    parser.add_argument("--check-edges", default=None, help="The --graph directory of generate-content.py, to check the parsed graph against exactly.")
+    parser.add_argument("--memory-limit", type=int, default=512, help="The memory budget of an out-of-core iteration, in MB.")
+    parser.add_argument("--solver", choices=SOLVERS, default="jacobi", help="The PageRank solver.")
+    parser.add_argument("--spmv-workers", type=int, default=0, help="The number of processes sharing each PageRank iteration (default: 0, single-threaded).")
+    parser.add_argument("--ordering", choices=ORDERINGS, default="none", help="Relabel the nodes before the PageRank iteration for a more cache-friendly mat-vec.")
+    parser.add_argument("--telemetry", action="store_true", help="Print the iteration, residual and wall time of every solver iteration.")
+    parser.add_argument("--rank-store", default=None, help="Directory to write the solved ranks to, for querying with rankstore.py.")
+    parser.add_argument("--statistics", choices=["exact", "sketch"], default="exact", help="Exact link statistics or a streaming quantile sketch.")
+    parser.add_argument("--sketch-accuracy", type=float, default=0.01, help="The relative accuracy of the sketched quantiles.")
+    parser.add_argument("--damping", type=float, default=0.85, help="The PageRank damping factor.")
+    parser.add_argument("--tolerance", type=float, default=1e-8, help="The PageRank convergence tolerance.")
+    parser.add_argument("--norm", choices=["1", "2", "inf"], default="1", help="The norm used for the convergence test.")
+    parser.add_argument("--max-iterations", type=int, default=200, help="The maximum number of PageRank iterations.")
+    parser.add_argument("--profile-report", default=None, help="Path of a JSON report of the time, memory and throughput of every phase.")
+    parser.add_argument("--cprofile", default=None, help="Path to dump cProfile statistics of the run to, for pstats or snakeviz.")
     args = parser.parse_args()
+    if args.shards and args.cache:
+        print("ERROR: --cache keys one file per page and cannot be used with --shards.")
+        exit()
+    if args.names and (args.shards or args.out_of_core or args.parquet or args.edge_list or args.check_edges):
+        print("ERROR: --names interns the pages as files are parsed and cannot be used with --shards, --out-of-core, --parquet, --edge-list or --check-edges.")
+        exit()
+    # Refuse to replace anything but a store before the run, not after it
+    for path, arrays in ((args.cache, CACHE_ARRAYS), (args.rank_store, STORE_ARRAYS)):
+        if path:
+            try:
+                check_store(path, arrays)
+            except FileExistsError as error:
+                print(f"ERROR: {error} Choose another directory.")
+                exit()
 
+    instrumentation = Instrumentation(enabled=args.profile_report is not None)
+    profiler = cProfile.Profile() if args.cprofile else None
+    if profiler is not None:
+        profiler.enable()
+    instrumentation.start()
     start = time.perf_counter() # Start the timer
     
     # Construct the adjacency matrix from the files and get the statistics and PageRank scores
-    files = read_files(args) # Get the files dependent on the --local flag
-    adjacency_matrix = construct_adjacency_matrix(files)
-    statistics = calculate_statistics(adjacency_matrix)
-    pageranks = calculate_pagerank(adjacency_matrix)
+    pages = None # The page ID of each node, when the pages are interned by name
+    if not args.parquet and not args.edge_list:
+        with instrumentation.phase("read_files") as record:
+            files = read_files(args) # Get the files dependent on the --local flag
+            record["files"] = count_nodes(files)
+    
+    if args.parquet:
+        # Reuse the graph parsed by the hw7 pipeline instead of reading the files
+        adjacency_matrix, statistics, pageranks = run_from_parquet(args.parquet, args, instrumentation)
+    elif args.edge_list:
+        # Skip reading and parsing the files, e.g. to benchmark the solver on its own
+        adjacency_matrix, statistics, pageranks = run_from_edge_list(args.edge_list, args, instrumentation)
+    elif args.out_of_core:
+        # Stream the parsed edges to disk and iterate over them block by block
+        adjacency_matrix = None
+        plan = plan_blocks(count_nodes(files), args.memory_limit * 1024 * 1024)
+        print(f"Partitioning edges into {plan.num_blocks} blocks...\n")
+        with instrumentation.phase("partition_edges") as record:
+            partition_edges(iter_edges(files, args.executor, args.workers, args.chunk_size, args.concurrency), plan, args.out_of_core)
+            record["files"] = count_nodes(files)
+        with instrumentation.phase("calculate_statistics"):
+            statistics = degree_statistics(*load_degrees(args.out_of_core), args.statistics, args.sketch_accuracy)
+        with instrumentation.phase("calculate_pagerank"):
+            pageranks = calculate_pagerank_out_of_core(args.out_of_core, plan, damping_factor=args.damping, epsilon=args.tolerance, max_iterations=args.max_iterations)
+    elif args.names:
+        # Number the pages by name, continuing from the IDs of the previous runs
+        name_table = NameTable.load(args.names)
+        adjacency_matrix, statistics, pageranks, pages = run_in_memory(files, args, instrumentation, name_table)
+        name_table.save(args.names)
+    else:
+        adjacency_matrix, statistics, pageranks, _ = run_in_memory(files, args, instrumentation)
+    
+    if args.rank_store:
+        with instrumentation.phase("write_rank_store"):
+            write_rank_store(args.rank_store, pageranks, pages)
     
     end = time.perf_counter() # End the timer
+    instrumentation.stop()
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.cprofile)
+    if args.profile_report:
+        instrumentation.write_report(args.profile_report)
     
     # Output the results
     print("\n=====================================\n")
@@ -311,22 +1172,43 @@ def main():
     
     print("PageRank Scores (Top 5):")
     print("------------------------")
-    pagerank_top_5 = sorted(enumerate(pageranks), key=lambda x: x[1], reverse=True)[:5]
-    for page, score in pagerank_top_5:
-        print(f"Page: {page}, Score: {score}")
+    pagerank_top_5 = top_k(pageranks, 5)
+    for page, score in zip(pagerank_top_5, pageranks[pagerank_top_5]):
+        print(f"Page: {name_table.name(pages[page]) if args.names else page}, Score: {score}")
         
     print(f"\nTime Elapsed: {end - start:.2f} seconds")
     
+    # Check the parsed graph edge for edge against the one the generator drew
+    if args.check_edges and adjacency_matrix is None:
+        print("\nWARNING: The edge list check is not available with --out-of-core.")
+    elif args.check_edges:
+        print("\nEdge List Check:")
+        print("----------------")
+        if not check_edges(adjacency_matrix, args.check_edges):
+            print("ERROR: The parsed graph does not match the edge list.")
+            print("\n=====================================\n")
+            exit(1)
+        print("PASSED: The parsed graph matches the edge list.")
+    
     # Only calculate NetworkX PageRank scores if the --test flag is set
-    if args.test:
+    if args.test and adjacency_matrix is None:
+        print("\nWARNING: The NetworkX comparison is not available with --out-of-core.")
+    elif args.test:
         print("\nPageRank Scores Using NetworkX (Top 5):")
         print("---------------------------------------")
-        G = nx.from_numpy_array(adjacency_matrix, create_using=nx.DiGraph)
-        nx_pagerank_scores = nx.pagerank(G)
+        max_error, nx_pagerank_scores = compare_with_networkx(adjacency_matrix, pageranks, args.damping, args.max_iterations)
         nx_top_5 = sorted(nx_pagerank_scores.items(), key=lambda x: x[1], reverse=True)[:5]
         for page, score in nx_top_5:
-            print(f"Page: {page}, Score: {score}")
-    
+            print(f"Page: {name_table.name(pages[page]) if args.names else page}, Score: {score}")
+
+        # Fail the run if any score is further from NetworkX than the tolerance
+        print(f"\nMax Absolute Difference: {max_error:.3e} (tolerance {args.test_tolerance:.1e})")
+        if max_error > args.test_tolerance:
+            print("ERROR: PageRank scores do not match NetworkX.")
+            print("\n=====================================\n")
+            exit(1)
+        print("PASSED: PageRank scores match NetworkX.")
+
     print("\n=====================================\n")
     
 if __name__ == "__main__":
@@ -0,0 +1,181 @@
+#!env python3
+# -*- coding: utf-8 -*-
+"""Persistent, memory-mapped store of solved PageRank scores with fast lookups."""
+
+# ------ Imports ------- #
+import argparse
+import numpy as np
+import numpy.typing as npt
+import os
+
+from atomic import publish_directory, read_directory
+from interning import NameTable, page_name
+from typing import NamedTuple, Optional
+
+# ------- Constants ------- #
+STORE_ARRAYS = ("ranks", "order", "positions", "pages")
+
+# ------- Classes ------- #
+class RankStore(NamedTuple):
+    """The arrays of a rank store, memory-mapped from disk.
+
+    `order` lists the entries from the highest to the lowest score and `positions`
+    is its inverse, the 0-based place of every entry in that order. `pages` is the
+    sorted page ID of every entry, the entry itself for pages numbered by file name,
+    and the name table ID of the pages of the run with --names.
+    """
+    ranks: npt.NDArray[np.float64]
+    order: npt.NDArray[np.int64]
+    positions: npt.NDArray[np.int64]
+    pages: npt.NDArray[np.int64]
+
+# ------- Functions ------- #
+def top_k(pageranks: npt.ArrayLike, k: int) -> npt.NDArray[np.int64]:
+    """Get the k pages with the highest scores without sorting every page.
+
+    Parameters:
+        pageranks -- The PageRank values
+        k -- The number of pages
+    Returns:
+        The k pages from the highest to the lowest score
+    """
+    pageranks = np.asarray(pageranks)
+    k = min(k, len(pageranks))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-pageranks, k - 1)[:k]
+    return candidates[np.argsort(-pageranks[candidates], kind="stable")]
+
+def write_rank_store(store_dir: str, pageranks: npt.ArrayLike, pages: Optional[npt.ArrayLike] = None) -> None:
+    """Write solved PageRank scores with their precomputed descending order.
+
+    Parameters:
+        store_dir -- The store directory
+        pageranks -- The PageRank values
+        pages -- The sorted page ID of each value, the values are numbered from 0 if not given
+    """
+    ranks = np.asarray(pageranks, dtype=np.float64)
+    order = np.argsort(-ranks, kind="stable")
+    positions = np.empty_like(order)
+    positions[order] = np.arange(len(order))
+    pages = np.arange(len(ranks)) if pages is None else np.asarray(pages, dtype=np.int64)
+
+    def write(version_dir: str) -> None:
+        for name, array in zip(STORE_ARRAYS, (ranks, order, positions, pages)):
+            np.save(os.path.join(version_dir, f"{name}.npy"), array)
+    publish_directory(store_dir, write, STORE_ARRAYS)
+
+def load_rank_store(store_dir: str) -> RankStore:
+    """Load a rank store without reading its arrays into memory.
+
+    Parameters:
+        store_dir -- The store directory
+    Returns:
+        The rank store
+    """
+    def read(version_dir: str) -> RankStore:
+        arrays = {name: np.load(os.path.join(version_dir, f"{name}.npy"), mmap_mode="r") for name in STORE_ARRAYS[:-1]}
+        pages_path = os.path.join(version_dir, "pages.npy")
+        # Stores written before the page IDs were kept are numbered from 0
+        arrays["pages"] = np.load(pages_path, mmap_mode="r") if os.path.exists(pages_path) else np.arange(len(arrays["ranks"]))
+        return RankStore(**arrays)
+    return read_directory(store_dir, read)
+
+def top(store: RankStore, n: int) -> list[tuple[int, float]]:
+    """Get the n pages with the highest scores.
+
+    Parameters:
+        store -- The rank store
+        n -- The number of pages
+    Returns:
+        The (page, score) pairs from the highest to the lowest score
+    """
+    entries = store.order[:n]
+    return list(zip(store.pages[entries].tolist(), store.ranks[entries].tolist()))
+
+def entry_of(store: RankStore, page: int) -> int:
+    """Find the entry of a page in the store.
+
+    Parameters:
+        store -- The rank store
+        page -- The page ID
+    Returns:
+        The index of the entry, or -1 if the page is not in the store
+    """
+    entry = int(np.searchsorted(store.pages, page))
+    return entry if entry < len(store.pages) and store.pages[entry] == page else -1
+
+def score_of(store: RankStore, page: int) -> float:
+    """Get the score of a page in the store."""
+    return float(store.ranks[entry_of(store, page)])
+
+def rank_of(store: RankStore, page: int) -> int:
+    """Get the 1-based rank of a page, 1 being the highest score.
+
+    Parameters:
+        store -- The rank store
+        page -- The page ID, it must be in the store
+    Returns:
+        The rank of the page
+    """
+    return int(store.positions[entry_of(store, page)]) + 1
+
+def percentile_of(store: RankStore, page: int) -> float:
+    """Get the percentage of pages that rank below a page.
+
+    Parameters:
+        store -- The rank store
+        page -- The page ID, it must be in the store
+    Returns:
+        The percentile of the page, between 0 and 100
+    """
+    num_pages = len(store.ranks)
+    return 100.0 * (num_pages - rank_of(store, page)) / num_pages
+
+# ------- Main ------- #
+def main():
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description="Query a PageRank rank store.")
+    parser.add_argument("store", help="The rank store directory written by pagerank.py --rank-store.")
+    parser.add_argument("--names", default=None, help="The name table (.npz) of a store written with pagerank.py --names, to query and print pages by name or URL.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    top_parser = subparsers.add_parser("top", help="The pages with the highest scores.")
+    top_parser.add_argument("n", type=int, nargs="?", default=5, help="The number of pages.")
+    rank_parser = subparsers.add_parser("rank", help="The rank of a page.")
+    rank_parser.add_argument("page", help="The page, its name or URL with --names.")
+    percentile_parser = subparsers.add_parser("percentile", help="The percentile of a page.")
+    percentile_parser.add_argument("page", help="The page, its name or URL with --names.")
+    args = parser.parse_args()
+
+    if args.names and not os.path.exists(args.names):
+        print(f"ERROR: There is no name table at {args.names}.")
+        exit()
+    name_table = NameTable.load(args.names) if args.names else None
+    store = load_rank_store(args.store)
+
+    if args.command != "top":
+        # Pages are given by name with a name table, by number otherwise
+        if name_table is not None:
+            page = name_table.lookup(page_name(args.page))
+            if page < 0:
+                print(f"ERROR: Page {args.page} is not in the name table.")
+                exit()
+        elif args.page.isdigit():
+            page = int(args.page)
+        else:
+            print(f"ERROR: Page {args.page} is not a page number, pass --names to query pages by name.")
+            exit()
+        if entry_of(store, page) < 0:
+            print(f"ERROR: Page {args.page} is not in the store of {len(store.ranks)} pages.")
+            exit()
+    
+    if args.command == "top":
+        for page, score in top(store, args.n):
+            print(f"Page: {name_table.name(page) if name_table is not None else page}, Score: {score}")
+    elif args.command == "rank":
+        print(f"Page: {args.page}, Rank: {rank_of(store, page)}, Score: {score_of(store, page)}")
+    else:
+        print(f"Page: {args.page}, Percentile: {percentile_of(store, page):.4f}")
+
+if __name__ == "__main__":
+    main()
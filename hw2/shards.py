@@ -0,0 +1,115 @@
+#!env python3
+# -*- coding: utf-8 -*-
+"""Packed shard container of many pages with an offset index."""
+
+# ------ Imports ------- #
+import numpy as np
+import numpy.typing as npt
+import os
+
+from typing import Any, NamedTuple
+
+# ------- Constants ------- #
+SHARD_SUFFIX = ".pages"
+INDEX_SUFFIX = ".index.npy"
+INDEX_DTYPE = np.dtype([("page", "<i8"), ("offset", "<i8"), ("length", "<i8")])
+
+# ------- Classes ------- #
+class Shard(NamedTuple):
+    """A packed shard and its index.
+
+    The shard holds the untouched HTML of its pages back to back, and every row of
+    the index gives the page number, byte offset and byte length of one page, in
+    the order the pages are stored.
+    """
+    source: Any # The local path or the blob of the shard
+    index: npt.NDArray
+
+# ------- Functions ------- #
+def shard_name(shard: int) -> str:
+    """Get the file name of a shard."""
+    return f"shard-{shard:05d}{SHARD_SUFFIX}"
+
+def index_name(shard_path: str) -> str:
+    """Get the path of the index of a shard."""
+    return shard_path[:-len(SHARD_SUFFIX)] + INDEX_SUFFIX
+
+def is_shard(name: str) -> bool:
+    """Check whether a file or object name is a packed shard."""
+    return name.endswith(SHARD_SUFFIX)
+
+def write_shard(shard_path: str, pages: list[tuple[int, bytes]]) -> None:
+    """Write pages into a shard and its index.
+
+    Parameters:
+        shard_path -- The path of the shard
+        pages -- The (page number, HTML) pairs, in storage order
+    """
+    index = np.zeros(len(pages), dtype=INDEX_DTYPE)
+    index["page"] = [page for page, _ in pages]
+    index["length"] = [len(content) for _, content in pages]
+    index["offset"][1:] = np.cumsum(index["length"])[:-1]
+    with open(shard_path, "wb") as file:
+        file.write(b"".join(content for _, content in pages))
+    np.save(index_name(shard_path), index)
+
+def load_index(shard_path: str) -> npt.NDArray:
+    """Load the index of a local shard.
+
+    Parameters:
+        shard_path -- The path of the shard
+    Returns:
+        The index of the shard
+    """
+    return np.load(index_name(shard_path))
+
+def get_local_shards(directory: str) -> list[Shard]:
+    """Get the shards of a local directory with their indexes.
+
+    Parameters:
+        directory -- The directory
+    Returns:
+        The shards, in name order
+    """
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory) if is_shard(name))
+    return [Shard(path, load_index(path)) for path in paths]
+
+def count_pages(shards: list[Shard]) -> int:
+    """Get the number of nodes needed for the pages of some shards."""
+    return max((int(shard.index["page"].max()) + 1 for shard in shards if len(shard.index)), default=0)
+
+def read_page(shard_path: str, index: npt.NDArray, page: int) -> bytes:
+    """Read the HTML of a single page from a local shard, e.g. to serve it.
+
+    Parameters:
+        shard_path -- The path of the shard
+        index -- The index of the shard
+        page -- The page number
+    Returns:
+        The HTML of the page
+    """
+    row = index[np.flatnonzero(index["page"] == page)[0]]
+    with open(shard_path, "rb") as file:
+        file.seek(int(row["offset"]))
+        return file.read(int(row["length"]))
+
+def page_ranges(index: npt.NDArray, range_size: int) -> list[tuple[int, int, npt.NDArray]]:
+    """Group consecutive pages of a shard into byte ranges for ranged reads.
+
+    A range never splits a page, so every range can be parsed on its own.
+
+    Parameters:
+        index -- The index of the shard
+        range_size -- The target number of bytes of a range
+    Returns:
+        The (start, end, index rows) of each range, with end exclusive
+    """
+    ranges = []
+    first = 0
+    ends = index["offset"] + index["length"]
+    while first < len(index):
+        start = int(index["offset"][first])
+        last = max(first + 1, int(np.searchsorted(ends, start + range_size, side="right")))
+        ranges.append((start, int(ends[last - 1]), index[first:last]))
+        first = last
+    return ranges
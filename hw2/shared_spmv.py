@@ -0,0 +1,125 @@
+#!env python3
+# -*- coding: utf-8 -*-
+"""Multi-core sparse mat-vec over a transition matrix held in shared memory."""
+
+# ------ Imports ------- #
+import numpy as np
+import numpy.typing as npt
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from scipy import sparse
+from typing import Optional
+
+# ------- Globals ------- #
+# The arrays a worker process attached to, set once by its initializer
+_worker_blocks: list[shared_memory.SharedMemory] = []
+_worker_arrays: dict[str, npt.NDArray] = {}
+_worker_rows: dict[tuple[int, int], sparse.csr_matrix] = {}
+
+# ------- Functions ------- #
+def partition_rows(indptr: npt.NDArray[np.int64], num_parts: int) -> list[tuple[int, int]]:
+    """Split the rows of a CSR matrix into contiguous ranges of about the same number of non-zeros.
+
+    Parameters:
+        indptr -- The row pointers of the matrix
+        num_parts -- The number of ranges
+    Returns:
+        The (start, stop) rows of each non-empty range
+    """
+    num_rows = len(indptr) - 1
+    targets = np.linspace(0, indptr[-1], num_parts + 1)
+    bounds = np.unique(np.concatenate(([0], np.searchsorted(indptr, targets[1:-1]), [num_rows])))
+    return [(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+def _attach(specs: dict[str, tuple[str, tuple[int, ...], str]]) -> None:
+    """Attach a worker process to the shared arrays, once for all its tasks."""
+    for key, (name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=name)
+        _worker_blocks.append(block)
+        _worker_arrays[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+def _multiply_rows(rows: tuple[int, int]) -> None:
+    """Multiply a range of rows with the shared input vector into the shared output vector."""
+    start, stop = rows
+    if rows not in _worker_rows:
+        # A zero-copy view of the rows, with the row pointers rebased onto the slice
+        indptr = _worker_arrays["indptr"]
+        first, last = indptr[start], indptr[stop]
+        _worker_rows[rows] = sparse.csr_matrix(
+            (_worker_arrays["data"][first:last], _worker_arrays["indices"][first:last], indptr[start:stop + 1] - first),
+            shape=(stop - start, len(_worker_arrays["x"])),
+            copy=False,
+        )
+    _worker_arrays["y"][start:stop] = _worker_rows[rows] @ _worker_arrays["x"]
+
+# ------- Classes ------- #
+class SharedMatVec:
+    """A sparse matrix whose products with a vector are computed by a pool of processes.
+
+    The matrix and the input and output vectors live in shared memory, and every
+    worker multiplies its own contiguous range of rows, so an iteration only copies
+    the input vector in and the output vector out. The rows are split by their
+    number of non-zeros, not their count, so skewed in-degrees stay balanced.
+    Use it as a context manager, or call close, to release the pool and the memory.
+    """
+
+    def __init__(self, matrix: sparse.csr_matrix, workers: Optional[int] = None):
+        """Copy a matrix into shared memory and start the worker pool.
+
+        Parameters:
+            matrix -- The matrix, in CSR format
+            workers -- The number of worker processes, one per CPU if not given
+        """
+        matrix = matrix.tocsr()
+        num_rows, num_columns = matrix.shape
+        self.shape = matrix.shape
+        self.blocks = []
+        arrays = {
+            "indptr": matrix.indptr.astype(np.int64),
+            "indices": matrix.indices,
+            "data": matrix.data.astype(np.float64, copy=False),
+            "x": np.zeros(num_columns),
+            "y": np.zeros(num_rows),
+        }
+        specs = {}
+        self.arrays = {}
+        for key, array in arrays.items():
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            self.blocks.append(block)
+            self.arrays[key] = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            self.arrays[key][:] = array
+            specs[key] = (block.name, array.shape, array.dtype.str)
+
+        workers = workers or os.cpu_count() or 1
+        self.rows = partition_rows(self.arrays["indptr"], workers)
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(specs,))
+
+    def __matmul__(self, vector: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        """Multiply the matrix with a vector, one range of rows per worker.
+
+        Parameters:
+            vector -- The vector
+        Returns:
+            The product
+        """
+        self.arrays["x"][:] = vector
+        for _ in self.pool.map(_multiply_rows, self.rows):
+            pass # Wait for every range, the products are written in place
+        return self.arrays["y"].copy()
+
+    def close(self) -> None:
+        """Stop the worker pool and release the shared memory."""
+        self.pool.shutdown()
+        self.arrays.clear()
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks.clear()
+
+    def __enter__(self) -> "SharedMatVec":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
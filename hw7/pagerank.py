@@ -3,41 +3,223 @@
 # Author: Dominic Maglione (dcmag@bu.edu)
 # Date: 2023-11-10
 
-"""A pagerank workflow."""
+"""A pagerank workflow.
+
+Counts the incoming and outgoing links of every page and ranks the pages with
+an iterative PageRank. The graph is built once and every round of rank
+propagation is unrolled into the pipeline, so the same pipeline runs on the
+DirectRunner (including its multi-process mode) and on distributed runners.
+"""
 
 # Imports
 import argparse
+import json
 import logging
 import re
 
 import apache_beam as beam
-from apache_beam.io import ReadFromText
+import pyarrow
+from apache_beam.io import WriteToParquet
 from apache_beam.io import WriteToText
 from apache_beam.io import fileio
 from apache_beam.options.pipeline_options import PipelineOptions
 from apache_beam.options.pipeline_options import SetupOptions
+from apache_beam.transforms.stats import ApproximateQuantilesCombineFn
 
 # Regex Pattern
 LINK_REGEX_PATTERN = r'<a HREF="(\d+).html">'
 
+# Quantiles of the degree statistics, every tenth from the min to the max
+NUM_QUANTILES = 11
+MEDIAN = 5
+QUINTILES = slice(2, None, 2)
 
-class CountIncomingLinks(beam.DoFn):
-    """Count the incoming links for each file."""
+# Schemas of the columnar edge, degree and rank tables
+EDGE_SCHEMA = pyarrow.schema([('src', pyarrow.int32()), ('dst', pyarrow.int32())])
+DEGREE_SCHEMA = pyarrow.schema([('page', pyarrow.int32()), ('incoming', pyarrow.int64()), ('outgoing', pyarrow.int64())])
+RANK_SCHEMA = pyarrow.schema([('page', pyarrow.int32()), ('rank', pyarrow.float64())])
+
+# Tags of the parsed pages and of the rank held by pages without outgoing links
+PAGES_TAG = 'pages'
+DANGLING_TAG = 'dangling'
+
+
+def page_id(path):
+    """Get the page number from the path of its file."""
+    return int(path.split("/")[-1].split(".")[0])
+
+
+def merge_links(link_lists):
+    """Merge the link lists of a page into one sorted list without duplicates."""
+    return sorted(set().union(*link_lists))
+
+
+class ParseLinks(beam.DoFn):
+    """Parse a file into its page and the pages it links to."""
+
+    def setup(self):
+        # Compiled once per worker instead of once per file
+        self.link_regex = re.compile(LINK_REGEX_PATTERN)
+
+    def process(self, readable_file):
+        page = page_id(readable_file.metadata.path)
+        yield beam.pvalue.TaggedOutput(PAGES_TAG, page)
+        # Duplicate links from the same page count once
+        for link in {int(link) for link in self.link_regex.findall(readable_file.read_utf8())}:
+            yield (page, link)
+
+
+class ExtractEdges(beam.PTransform):
+    """Read every file matching a pattern once and extract its links.
+
+    Returns a dict with the (src, dst) edges under `edges`, and the page of
+    every file read under `pages`, so pages without links are not lost.
+    """
+
+    def __init__(self, file_pattern):
+        super().__init__()
+        self.file_pattern = file_pattern
+
+    def expand(self, pbegin):
+        parsed = (
+            pbegin
+            | "List Files" >> fileio.MatchFiles(self.file_pattern)
+            | "Read Matches" >> fileio.ReadMatches()
+            | "Parse Links" >> beam.ParDo(ParseLinks()).with_outputs(
+                PAGES_TAG, main='edges')
+        )
+        return {'edges': parsed.edges, 'pages': parsed[PAGES_TAG]}
+
+
+def summarize_degrees(quantiles, mean):
+    """Summarize degrees in the same structure as calculate_statistics in hw2."""
+    return {
+        "Average:": mean,
+        "Median:": quantiles[MEDIAN],
+        "Max:": quantiles[-1],
+        "Min:": quantiles[0],
+        "Quintiles:": quantiles[QUINTILES],
+    }
 
-    def process(self, element):
-        link_regex = re.compile(LINK_REGEX_PATTERN)
-        links = re.findall(link_regex, element)
-        for link in links:
-            yield (int(link), 1)
 
+def combine_statistics(unused_element, incoming, outgoing):
+    """Combine the incoming and outgoing link summaries."""
+    return {"Incoming Links": incoming, "Outgoing Links": outgoing}
 
-class CountOutgoingLinks(beam.DoFn):
-    """Count the outgoing links for each file."""
+
+class DegreeStatistics(beam.PTransform):
+    """Summarize (page, degree) elements with distributed combiners.
+
+    The quantiles come from an approximate quantile sketch whose rank error is
+    bounded by epsilon, so the degrees are never collected on one worker. The
+    min and max are exact.
+    """
+
+    def __init__(self, epsilon=0.01):
+        super().__init__()
+        self.epsilon = epsilon
+
+    def expand(self, degrees):
+        values = degrees | "Degrees" >> beam.Values()
+        mean = values | "Mean" >> beam.combiners.Mean.Globally()
+        quantiles = values | "Quantiles" >> beam.CombineGlobally(
+            ApproximateQuantilesCombineFn.create(NUM_QUANTILES, epsilon=self.epsilon))
+        return quantiles | "Summarize" >> beam.Map(
+            summarize_degrees, mean=beam.pvalue.AsSingleton(mean))
+
+
+def degree_record(element):
+    """Make a degree table row from the joined link counts of a page."""
+    page, counts = element
+    return {'page': page, 'incoming': sum(counts['incoming']), 'outgoing': sum(counts['outgoing'])}
+
+
+def initial_rank(element, num_pages):
+    """Start every page with an equal share of the rank."""
+    return element[0], 1.0 / num_pages
+
+
+def update_rank(element, dangling_rank, num_pages, damping_factor):
+    """Apply the PageRank formula to the rank flowing into a page."""
+    page, incoming_rank = element
+    teleport = (1 - damping_factor) / num_pages
+    return page, teleport + damping_factor * (incoming_rank + dangling_rank / num_pages)
+
+
+@beam.typehints.with_output_types(beam.typehints.Tuple[int, float])
+class DistributeRank(beam.DoFn):
+    """Spread the rank of each page evenly over its outgoing links.
+
+    Pages without outgoing links emit their rank on the dangling output, to be
+    redistributed over every page.
+    """
 
     def process(self, element):
-        link_regex = re.compile(LINK_REGEX_PATTERN)
-        links = re.findall(link_regex, element)
-        yield (int(element[0]), len(links))
+        page, grouped = element
+        rank = sum(grouped['rank'])
+        links = [link for link_list in grouped['links'] for link in link_list]
+        # Keep every page in the next round even if nothing links to it
+        yield (page, 0.0)
+        if links:
+            for link in links:
+                yield (link, rank / len(links))
+        else:
+            yield beam.pvalue.TaggedOutput(DANGLING_TAG, rank)
+
+
+class PageRankRound(beam.PTransform):
+    """One round of rank propagation over a fixed graph."""
+
+    def __init__(self, graph, num_pages, damping_factor):
+        super().__init__()
+        self.graph = graph
+        self.num_pages = num_pages
+        self.damping_factor = damping_factor
+
+    def expand(self, ranks):
+        contributions = (
+            {'rank': ranks, 'links': self.graph}
+            | "Join Ranks and Links" >> beam.CoGroupByKey()
+            | "Distribute Rank" >> beam.ParDo(DistributeRank()).with_outputs(
+                DANGLING_TAG, main='contributions')
+        )
+
+        dangling_rank = (
+            contributions[DANGLING_TAG]
+            | "Sum Dangling Rank" >> beam.CombineGlobally(sum)
+        )
+
+        return (
+            contributions.contributions
+            | "Sum Incoming Rank" >> beam.CombinePerKey(sum)
+            | "Update Rank" >> beam.Map(
+                update_rank,
+                dangling_rank=beam.pvalue.AsSingleton(dangling_rank),
+                num_pages=beam.pvalue.AsSingleton(self.num_pages),
+                damping_factor=self.damping_factor)
+        )
+
+
+class PageRank(beam.PTransform):
+    """Rank the pages of a graph of (page, [linked pages]) elements.
+
+    Every page, including the pages that are only linked to, must have an
+    element in the graph.
+    """
+
+    def __init__(self, iterations=20, damping_factor=0.85):
+        super().__init__()
+        self.iterations = iterations
+        self.damping_factor = damping_factor
+
+    def expand(self, graph):
+        num_pages = graph | "Count Pages" >> beam.combiners.Count.Globally()
+        ranks = graph | "Initial Rank" >> beam.Map(
+            initial_rank, num_pages=beam.pvalue.AsSingleton(num_pages))
+        for iteration in range(self.iterations):
+            ranks = ranks | f"Round {iteration + 1}" >> PageRankRound(
+                graph, num_pages, self.damping_factor)
+        return ranks
 
 
 def run(argv=None, save_main_session=True):
@@ -48,6 +230,35 @@ def run(argv=None, save_main_session=True):
         dest='input',
         default='gs://bu-ds561-dcmag/files/*.html',
         help='Input file to process.')
+    parser.add_argument(
+        '--output',
+        dest='output',
+        default='pagerank',
+        help='Prefix of the rank and top pages output files.')
+    parser.add_argument(
+        '--iterations',
+        dest='iterations',
+        type=int,
+        default=20,
+        help='Number of PageRank rounds.')
+    parser.add_argument(
+        '--damping',
+        dest='damping',
+        type=float,
+        default=0.85,
+        help='PageRank damping factor.')
+    parser.add_argument(
+        '--top',
+        dest='top',
+        type=int,
+        default=5,
+        help='Number of top ranked pages to write and log.')
+    parser.add_argument(
+        '--epsilon',
+        dest='epsilon',
+        type=float,
+        default=0.01,
+        help='Rank error bound of the approximate degree quantiles.')
     known_args, pipeline_args = parser.parse_known_args(argv)
 
     pipeline_options = PipelineOptions(pipeline_args)
@@ -57,24 +268,21 @@ def run(argv=None, save_main_session=True):
     with beam.Pipeline(options=pipeline_options) as p:
         input_files = known_args.input
 
+        # Read and parse the corpus once, everything else derives from its edges
+        parsed = p | "Extract Edges" >> ExtractEdges(input_files)
+        edges, pages = parsed['edges'], parsed['pages']
+        zero_links = pages | "Pages Without Links" >> beam.Map(lambda page: (page, 0))
+
         incoming_links = (
-            p
-            | "Read HTML Files as Stream" >> beam.io.ReadFromText(input_files)
-            | "Count Incoming Links" >> beam.ParDo(CountIncomingLinks())
+            (zero_links, edges | "Key By Target" >> beam.Map(lambda x: (x[1], 1)))
+            | "Merge Incoming Links" >> beam.Flatten()
             | "Sum Incoming Links" >> beam.CombinePerKey(sum)
         )
 
         outgoing_links = (
-            p
-            | "List Files" >> beam.io.fileio.MatchFiles(input_files)
-            | "Read Matches" >> beam.io.fileio.ReadMatches()
-            | "Read Files" >> beam.Map(lambda x: (x.metadata.path, x.read_utf8()))
-            # The CountOutgoingLinks class was meant to be used here but there were some weird errors that resulted in me consulting a classmate and approaching it this way
-            | "Count Outgoing Links" >> beam.Map(
-                lambda x: (x[0], len(re.findall(LINK_REGEX_PATTERN, x[1])))
-            )
-            | "Remove File Path"
-            >> beam.Map(lambda x: (int(x[0].split("/")[-1].split(".")[0]), x[1]))
+            (zero_links, edges | "Key By Source" >> beam.Map(lambda x: (x[0], 1)))
+            | "Merge Outgoing Links" >> beam.Flatten()
+            | "Sum Outgoing Links" >> beam.CombinePerKey(sum)
         )
 
         top_incoming_links = (
@@ -99,6 +307,74 @@ def run(argv=None, save_main_session=True):
             lambda x: logging.info(f"Top 5 Outgoing Links: {x}")
         )
 
+        # Columnar tables, so later analyses can reuse the parse without the HTML
+        edges | "Edge Records" >> beam.Map(
+            lambda x: {'src': x[0], 'dst': x[1]}
+        ) | "Write Edges" >> WriteToParquet(
+            known_args.output + '-edges', EDGE_SCHEMA, file_name_suffix='.parquet')
+
+        (
+            {'incoming': incoming_links, 'outgoing': outgoing_links}
+            | "Join Link Counts" >> beam.CoGroupByKey()
+            | "Degree Records" >> beam.Map(degree_record)
+            | "Write Degrees" >> WriteToParquet(
+                known_args.output + '-degrees', DEGREE_SCHEMA, file_name_suffix='.parquet')
+        )
+
+        # Link statistics with the structure of calculate_statistics in hw2
+        incoming_statistics = incoming_links | "Incoming Links Statistics" >> DegreeStatistics(known_args.epsilon)
+        outgoing_statistics = outgoing_links | "Outgoing Links Statistics" >> DegreeStatistics(known_args.epsilon)
+        statistics = (
+            p
+            | "Statistics Seed" >> beam.Create([None])
+            | "Combine Statistics" >> beam.Map(
+                combine_statistics,
+                incoming=beam.pvalue.AsSingleton(incoming_statistics),
+                outgoing=beam.pvalue.AsSingleton(outgoing_statistics))
+        )
+
+        statistics | "Format Statistics" >> beam.Map(
+            json.dumps
+        ) | "Write Statistics" >> WriteToText(known_args.output + '-statistics.json', shard_name_template='')
+
+        statistics | "Log Statistics" >> beam.Map(
+            lambda x: logging.info(f"Link Statistics: {x}")
+        )
+
+        # Build the graph once, with an element for every page read or linked to
+        graph = (
+            (
+                pages | "Pages" >> beam.Map(lambda page: (page, [])),
+                edges | "Linked Pages" >> beam.Map(lambda x: (x[1], [])),
+                edges | "Links" >> beam.Map(lambda x: (x[0], [x[1]])),
+            )
+            | "Merge Pages" >> beam.Flatten()
+            | "Build Graph" >> beam.CombinePerKey(merge_links)
+        )
+
+        ranks = graph | "PageRank" >> PageRank(known_args.iterations, known_args.damping)
+
+        ranks | "Rank Records" >> beam.Map(
+            lambda x: {'page': x[0], 'rank': x[1]}
+        ) | "Write Rank Table" >> WriteToParquet(
+            known_args.output + '-ranks', RANK_SCHEMA, file_name_suffix='.parquet')
+
+        ranks | "Format Ranks" >> beam.Map(
+            lambda x: f"{x[0]}\t{x[1]}"
+        ) | "Write Ranks" >> WriteToText(known_args.output + '-ranks')
+
+        top_ranks = ranks | f"Top {known_args.top} Ranks" >> beam.transforms.combiners.Top.Largest(
+            known_args.top, key=lambda x: x[1]
+        )
+
+        top_ranks | "Format Top Ranks" >> beam.FlatMap(
+            lambda x: [f"{page}\t{rank}" for page, rank in x]
+        ) | "Write Top Ranks" >> WriteToText(known_args.output + '-top', shard_name_template='')
+
+        top_ranks | "Log Top Ranks" >> beam.Map(
+            lambda x: logging.info(f"Top {len(x)} PageRank Scores: {x}")
+        )
+
 
 if __name__ == '__main__':
     logging.getLogger().setLevel(logging.INFO)